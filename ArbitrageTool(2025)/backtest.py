@@ -0,0 +1,211 @@
+"""
+Replays recorded snapshots (see history.py) through the flip scanner to measure
+whether a MarketConfig actually makes money.
+
+Every HOLD_PERIOD the market is rebuilt from the recorded snapshot and capital is
+allocated with Market.allocate_capital, then the orders are filled and sold against
+the snapshots that follow. Configurations and time ranges run in parallel processes.
+
+Run: python backtest.py bazaar_history --grid SAME_ORDER_THRESHOLD=0.5,1,2 MANIPULATED_PRICE_THRESHOLD=30,50
+"""
+
+import math
+import json
+import logging
+import argparse
+import itertools
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+
+from bazaar import Market, MarketConfig
+from history import SnapshotStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HOLD_PERIOD = 3600#Seconds an order is left to fill and sell before the position is closed
+FILL_FIELDS = ("buy_summary_0_pricePerUnit", "buyPrice", "sellPrice", "buyMovingWeek", "sellMovingWeek")
+DEFAULT_CONFIG = {key: value for key, value in vars(MarketConfig).items() if key.isupper()}
+
+@dataclass
+class BacktestResult:
+    config: dict
+    start: float
+    end: float
+    trades: int = 0
+    invested: float = 0.0
+    realised_profit: float = 0.0#Proceeds of items sold on the bazaar minus their cost
+    liquidation_profit: float = 0.0#Unsold items instantly sold when the position is closed, minus their cost
+
+    @property
+    def total_profit(self) -> float:
+        return self.realised_profit + self.liquidation_profit
+
+def apply_config(config: dict) -> None:
+    """Reset MarketConfig to its defaults, then apply the overrides"""
+    for key, value in {**DEFAULT_CONFIG, **config}.items():
+        setattr(MarketConfig, key, value)
+
+def simulate_order(order: Market.Order, timestamps, columns: dict) -> tuple:
+    """
+    Fill a buy order and sell what was bought against the snapshots after it was placed
+
+    Buy orders fill at the product's purchase velocity while no one outbids them,
+    bought items are sold at the sales velocity at the quick buy price of the moment.
+
+    Arguments:
+        order (Order): The buy order placed, see Market.allocate_capital
+        timestamps (array): Seconds since epoch of the following snapshots
+        columns (dict): FILL_FIELDS of the product at each timestamp
+
+    Returns:
+        filled (int): Items bought
+        sold (float): Items sold on the bazaar before the position closed, at the average sales velocity
+        realised (float): Coins received for the items sold, after tax
+        liquidation (float): Coins received for instantly selling the rest when the position closes, after tax
+    """
+    after_tax = 1 - MarketConfig.BAZAAR_TAX / 100
+    filled = sold = 0.0
+    realised = 0.0
+    sell_price = None
+    for position in range(1, len(timestamps)):
+        hours = (timestamps[position] - timestamps[position - 1]) / 3600
+        top_bid = columns["buy_summary_0_pricePerUnit"][position]
+        if math.isnan(top_bid):
+            continue
+
+        if top_bid <= order.average_price:#Outbid orders do not fill
+            purchases = columns["sellMovingWeek"][position] / MarketConfig.HOURS_IN_WEEK * hours
+            filled = min(order.quantity, filled + purchases)
+
+        sales = columns["buyMovingWeek"][position] / MarketConfig.HOURS_IN_WEEK * hours
+        selling = min(math.floor(filled) - sold, sales)
+        realised += selling * columns["buyPrice"][position] * after_tax
+        sold += selling
+        sell_price = columns["sellPrice"][position]
+
+    filled = math.floor(filled)
+    liquidation = (filled - sold) * sell_price * after_tax if sell_price else 0.0
+    return filled, sold, realised, liquidation
+
+def run_backtest(store_directory: str, config: dict, start: float, end: float, capital: float) -> BacktestResult:
+    """
+    Backtest one configuration over one time range, meant to run in its own process
+
+    Arguments:
+        store_directory (str): Directory of the SnapshotStore
+        config (dict): MarketConfig overrides
+        start (float): Seconds since epoch of the first decision
+        end (float): Seconds since epoch after which no new positions are opened
+        capital (float): Coins allocated at every decision
+
+    Returns:
+        result (BacktestResult): Profit of the configuration over the range
+    """
+    logging.getLogger("bazaar").setLevel(logging.WARNING)
+    apply_config(config)
+    store = SnapshotStore(store_directory)
+    market = Market(capital)
+    result = BacktestResult(config, start, end)
+
+    decision_time = start
+    while decision_time < end:
+        index = store.find_snapshot(decision_time)
+        if index >= store.snapshot_count:
+            break
+        timestamp, products = store.read_snapshot(index)
+        market.update_catalogue(products)
+        hold_end = timestamp + HOLD_PERIOD
+
+        for order in market.allocate_capital():
+            history = store.read(order.product_id, timestamp, hold_end, FILL_FIELDS)
+            filled, sold, realised, liquidation = simulate_order(order, history.timestamps, history.columns)
+            if not filled:
+                continue
+            result.trades += 1
+            result.invested += filled * order.average_price
+            result.realised_profit += realised - sold * order.average_price
+            result.liquidation_profit += liquidation - (filled - sold) * order.average_price
+        decision_time = hold_end
+    return result
+
+def split_range(start: float, end: float, parts: int) -> list:
+    """Split a time range into parts aligned to HOLD_PERIOD"""
+    periods = max(1, math.ceil((end - start) / HOLD_PERIOD))
+    parts = max(1, min(parts, periods))
+    bounds = [start + HOLD_PERIOD * math.ceil(periods * part / parts) for part in range(parts + 1)]
+    bounds[-1] = end
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def run_grid(store_directory: str, configs: list, start: float, end: float, capital: float, ranges: int = 1, workers: int = None) -> list:
+    """
+    Backtest every configuration over every time range across a process pool
+
+    Arguments:
+        configs (list[dict]): MarketConfig overrides to compare
+        ranges (int): Number of pieces each configuration's time range is split into
+
+    Returns:
+        results (list[BacktestResult]): One result per configuration over the whole range, most profitable first
+    """
+    tasks = [(config, range_start, range_end) for config in configs for range_start, range_end in split_range(start, end, ranges)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_backtest, store_directory, config, range_start, range_end, capital)
+                   for config, range_start, range_end in tasks]
+        partials = [future.result() for future in futures]
+
+    results = {}
+    for partial in partials:
+        key = json.dumps(partial.config, sort_keys=True)
+        if key not in results:
+            results[key] = BacktestResult(partial.config, start, end)
+        total = results[key]
+        total.trades += partial.trades
+        total.invested += partial.invested
+        total.realised_profit += partial.realised_profit
+        total.liquidation_profit += partial.liquidation_profit
+    return sorted(results.values(), key=lambda result: result.total_profit, reverse=True)
+
+def parse_grid(parameters: list) -> list:
+    """
+    Arguments:
+        parameters (list[str]): "NAME=value1,value2" strings
+
+    Returns:
+        configs (list[dict]): Every combination of the values
+    """
+    names = []
+    values = []
+    for parameter in parameters:
+        name, options = parameter.split("=", 1)
+        if name not in DEFAULT_CONFIG:
+            raise ValueError(f"{name} is not a MarketConfig parameter!")
+        names.append(name)
+        values.append([type(DEFAULT_CONFIG[name])(float(option)) for option in options.split(",")])
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest MarketConfig values against recorded bazaar snapshots")
+    parser.add_argument("store", help="Directory of the snapshot history store")
+    parser.add_argument("--grid", nargs="*", default=[], help="NAME=value1,value2 MarketConfig values to compare")
+    parser.add_argument("--capital", type=float, default=MarketConfig.DEFAULT_CAPITAL)
+    parser.add_argument("--start", type=float, help="Seconds since epoch, defaults to the first snapshot")
+    parser.add_argument("--end", type=float, help="Seconds since epoch, defaults to the last snapshot")
+    parser.add_argument("--ranges", type=int, default=1, help="Split every configuration's time range across this many processes")
+    parser.add_argument("--workers", type=int, help="Number of processes, defaults to the number of CPUs")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store)
+    if not store.snapshot_count:
+        logger.error(f"No snapshots recorded in {args.store}!")
+        return
+    start = args.start if args.start is not None else store.read_snapshot(0)[0]
+    end = args.end if args.end is not None else store.read_snapshot(store.snapshot_count - 1)[0]
+
+    configs = parse_grid(args.grid) or [{}]
+    logger.info(f"Backtesting {len(configs)} configurations from {start} to {end}")
+    for result in run_grid(args.store, configs, start, end, args.capital, args.ranges, args.workers):
+        print(json.dumps({**asdict(result), "total_profit": result.total_profit}))
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
 import json
+import os
+import re
+import gzip
+import base64
+import mmap
+import struct
 
 import time
 from datetime import datetime
@@ -7,9 +15,21 @@ from datetime import datetime
 import logging
 import math
 import heapq
+import argparse
+import bisect
+import random
+import queue
+import threading
+import asyncio
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 
 from dataclasses import dataclass
 
+from history import SnapshotStore
+from telemetry import metrics
+from feed import open_feed
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,90 +45,498 @@ class Market:
             scraper (Scraper):  A custom scraper object(see Scraper)
             catalogue (Dict[List]): Holds bazaar product data, every key is a product_id, keys map to Item object (see Item)
             capital (float): Total number of coins to be invested
+            ranking (FlipRanking): Persistent ranking of every scored product (see FlipRanking)
+            pruned (LiquidityIndex): Products left unscored as they cannot reach the top flips (see LiquidityIndex)
+            changed (set): product_ids whose data changed since they were last scored
+            from_cache (bool): True while the catalogue is the warm-start cache and no live data has arrived
+            cached_flips (list): The best flips saved with the warm-start cache, see load_cache
+            risk_adjusted (bool): Rank by risk adjusted profit instead of profit per hour, see Item.calculate_risk_adjusted_profit
+            lowest_bins (dict): Lowest BIN of every item on the auction house, see AuctionScraper
     """
-    def __init__(self):
+    CACHE_MAGIC = b"BZWC"
+    CACHE_HEADER = struct.Struct("<4sI")#magic, metadata length
+
+    def __init__(self, capital: float = None, url: str = None, risk_adjusted: bool = False):
 
         self.timestamp = datetime.min
-        self.scraper = Scraper()
+        self.scraper = Scraper(url)
 
         self.catalogue = {}
         self.capital = 0.0
+        self.risk_adjusted = risk_adjusted
+        self.ranking = FlipRanking("risk_adjusted_profit" if risk_adjusted else "profit_per_hour")
+        self.pruned = LiquidityIndex()
+        self.changed = set()
+        self.from_cache = False
+        self.cached_flips = []
+        self.lowest_bins = {}
+        self.set_capital(capital)
         logger.info("Market Object successfully created!")
 
 
-    def __update_catalogue(self) -> None:
+    def update_catalogue(self, new_catalogue: dict) -> None:
         """
-        Checks if the data needs to be refreshed, if so then fetch bazaar products from API and copy the new product data into the catalogue
+        Copy the new product data into the catalogue, remembering which products actually changed
+
+        Arguments:
+            new_catalogue (dict): Products fetched from the API, see Scraper.fetch_catalogue
         """
-        if self.__check_if_data_stale():#prevent accidentally flooding the API 
-            logger.info("Updating catalogue details!")
-            self.timestamp = datetime.now()
-            new_catalogue = self.scraper.fetch_catalogue()
+        logger.info("Updating catalogue details!")
+        self.timestamp = datetime.now()
+        self.from_cache = False
+        refined = 0
+        with metrics.time_phase("refine"):
             for product_id, product_data in new_catalogue.items():
                 if product_id in self.catalogue:#Reduce overhead
-                    self.catalogue[product_id].update_item(product_data)
+                    if self.catalogue[product_id].update_item(product_data):
+                        self.changed.add(product_id)
+                        refined += 1
+                    elif self.risk_adjusted:#Rolling statistics move on every snapshot
+                        self.changed.add(product_id)
                 else:
                     self.catalogue[product_id] = Item(product_id, product_data)
+                    self.changed.add(product_id)
+                    refined += 1
+        metrics.increment("products_refined_total", refined)
+        metrics.increment("products_skipped_total", len(new_catalogue) - refined)
+        logger.info(f"{len(self.changed)}/{len(new_catalogue)} products changed")
 
-    def __check_if_data_stale(self) -> bool: 
+    def set_capital(self, capital: float = None) -> None:
         """
-        Private function to check if the data needs to be refreshed by comparing the time since the last update with the config TTL
-        
-        Returns:
-            bool: True = Stale, False = Fresh
+        Arguments:
+            capital (float): Total coins at risk, MarketConfig.DEFAULT_CAPITAL if not given
         """
-        time_elapsed = (datetime.now() - self.timestamp).total_seconds()
-        if time_elapsed > MarketConfig.DATA_TTL:
-            return True
-        else:
-            return False
-    
-    def set_capital(self) -> float:
-        try:
-            self.capital = float(input("Input total capital at risk: (Leave blank for 1b)").strip())
-        except: 
-            if not self.capital:
-                self.capital = 1000000000.0#1,000,000,000
+        previous_capital = self.capital
+        self.capital = float(capital) if capital else MarketConfig.DEFAULT_CAPITAL
+        if self.capital != previous_capital:#Every score depends on capital
+            self.changed.update(self.catalogue)
                 
     @dataclass
     class Flip:
         product_id: str
         profit_per_hour: float
         imbalance: str
+        risk_adjusted_profit: float = 0.0
         def __lt__(self, other):#Max heap instead of min heap
             return self.profit_per_hour < other.profit_per_hour
 
+    def rescore_changed_products(self) -> None:
+        """
+        Score only the products which changed since the last scan and update the ranking in place
+
+        Products whose profit upper bound (see Item.calculate_profit_bound) is below the current
+        worst shown flip are not scored, they wait in the pruned index until the top flips fall below their bound
+        """
+        shown = MarketConfig.MAX_FLIPS_SHOWN
+        with metrics.time_phase("score"):
+            threshold = self.ranking.threshold(shown)
+            pruned = 0
+            for product_id in self.changed:
+                product = self.catalogue[product_id]
+                if not product.is_tradeable():
+                    self.ranking.remove(product_id)
+                    self.pruned.remove(product_id)
+                    continue
+
+                profit_bound = product.calculate_profit_bound()
+                if profit_bound < threshold:#Cannot enter the top flips
+                    self.ranking.remove(product_id)
+                    self.pruned.update(product_id, profit_bound)
+                    pruned += 1
+                    continue
+                self.pruned.remove(product_id)
+                self.score_product(product)
+
+            while self.pruned and self.pruned.best_bound() >= self.ranking.threshold(shown):#Top flips got worse
+                self.score_product(self.catalogue[self.pruned.pop_best()])
+        metrics.increment("products_pruned_total", pruned)
+        self.changed.clear()
+
+    def score_product(self, product: "Item") -> None:
+        profit_per_hour = product.calculate_profit_per_hour(self.capital)
+        imbalance = product.calculate_book_imbalance()
+        risk_adjusted_profit = product.calculate_risk_adjusted_profit(self.capital, profit_per_hour)
+        self.ranking.update(self.Flip(product.product_id, profit_per_hour, imbalance, risk_adjusted_profit))
+
+    def rank_flips(self) -> list:
+        """
+        Returns:
+            best_flips (list[Flip]): The MarketConfig.MAX_FLIPS_SHOWN best flips, best first
+        """
+        self.rescore_changed_products()
+        if self.scraper.last_updated:#Zero until live data arrives
+            metrics.set_gauge("snapshot_age_seconds", time.time() - self.scraper.last_updated / 1000)
+        with metrics.time_phase("select"):
+            return self.ranking.top(MarketConfig.MAX_FLIPS_SHOWN)
+
     def scan_for_flips(self) -> None:
         """
         Search all products for the best flips, prints a specific number of flips.
 
+        Only the current catalogue is scanned, new data is fed in by update_catalogue (see RefreshScheduler)
+
         The number of flips returned is dependant on MarketConfig.MAX_FLIPS_SHOWN   
+
+        Cross-market flips are shown as well once an auction house sweep arrived (see update_auctions)
         """
-        if not self.capital:
-            self.set_capital()
-        if self.__check_if_data_stale():#No point recalculating if using the same data
-            self.__update_catalogue()
+        self.print_flips(self.rank_flips())
+        if self.lowest_bins:
+            self.print_cross_market_flips(self.find_cross_market_flips())
 
-            best_flips = []
-            if self.catalogue:
-                for product in self.catalogue.values():
-                    if not product.is_tradeable():
-                        continue
+    @dataclass
+    class CrossFlip:
+        product_id: str
+        direction: str#"auction -> bazaar" or "bazaar -> auction"
+        buy_price: float
+        sell_price: float#After tax
+        profit_per_item: float
+        auction_uuid: str#The lowest BIN, bought or undercut
 
-                    profit_per_hour = product.calculate_profit_per_hour(self.capital)
-                    imbalance = product.calculate_book_imbalance()
-                    flip = self.Flip(product.product_id, profit_per_hour, imbalance)
-                    if len(best_flips) < MarketConfig.MAX_FLIPS_SHOWN:
-                        heapq.heappush(best_flips, flip)
-                    elif profit_per_hour > best_flips[0].profit_per_hour:
-                        heapq.heapreplace(best_flips, flip)
-        
+    def update_auctions(self, lowest_bins: dict) -> None:
+        """
+        Arguments:
+            lowest_bins (dict): Lowest BIN index of an auction house sweep, see AuctionScraper.fetch_catalogue
+        """
+        self.lowest_bins = lowest_bins
+
+    def find_cross_market_flips(self) -> list:
+        """
+        Join the lowest BIN index with the catalogue, in both directions:
+        buy the lowest BIN and instantly sell on the bazaar, or instantly buy on the bazaar and list just under the lowest BIN
+
+        Returns:
+            cross_flips (list[CrossFlip]): The MarketConfig.MAX_FLIPS_SHOWN most profitable, best first
+        """
+        bazaar_after_tax = 1 - MarketConfig.BAZAAR_TAX / 100
+        auction_after_tax = 1 - MarketConfig.AUCTION_TAX / 100
+        lowest_bins = self.lowest_bins
+        cross_flips = []
+        for product_id in lowest_bins.keys() & self.catalogue.keys():
+            product = self.catalogue[product_id]
+            lowest_bin = lowest_bins[product_id]
+            if product.sell_price > 0:
+                sell_price = product.fetch_quick_sell_cost() * bazaar_after_tax
+                cross_flips.append(self.CrossFlip(product_id, "auction -> bazaar", lowest_bin.price, sell_price,
+                                                  sell_price - lowest_bin.price, lowest_bin.uuid))
+            if product.buy_price > 0:
+                sell_price = lowest_bin.price * auction_after_tax
+                cross_flips.append(self.CrossFlip(product_id, "bazaar -> auction", product.fetch_quick_buy_cost(), sell_price,
+                                                  sell_price - product.fetch_quick_buy_cost(), lowest_bin.uuid))
+        return heapq.nlargest(MarketConfig.MAX_FLIPS_SHOWN, (flip for flip in cross_flips if flip.profit_per_item > 0),
+                              key=lambda flip: flip.profit_per_item)
+
+    def print_cross_market_flips(self, cross_flips: list) -> None:
+        if cross_flips:
+            print(f"=== TOP {MarketConfig.MAX_FLIPS_SHOWN} CROSS-MARKET FLIPS ===")
+            for flip in cross_flips:
+                print(f"Potential flip: {flip.product_id}, {flip.direction}, buy at {flip.buy_price:,.1f}, "
+                      f"sell at {flip.sell_price:,.1f}, profit per item: {flip.profit_per_item:,.1f}")
+        else:
+            print("No cross-market flips could be found!")
+
+    def print_flips(self, best_flips: list) -> None:
+        if best_flips:
+            stale_label = f" (CACHED FROM {self.timestamp:%Y-%m-%d %H:%M:%S})" if self.from_cache else ""
+            print(f"=== TOP {MarketConfig.MAX_FLIPS_SHOWN} BEST FLIPS{stale_label} ===")
+            for flip in best_flips:
+                risk_label = f", risk adjusted: {flip.risk_adjusted_profit}" if self.risk_adjusted else ""
+                print(f"Potential flip: {flip.product_id}, Estimated revenue per hour: {flip.profit_per_hour}{risk_label}, imbalance: {flip.imbalance}")
+        else:
+            print("No flips could be found!")
+
+    def save_cache(self, path: str) -> None:
+        """
+        Persist the refined catalogue and the best flips so the next start has something to show immediately
+
+        Layout: header, JSON metadata, then every product's quick status and summary arrays as raw 8 byte values.
+        Written to a temporary file first so a crash never leaves a half written cache.
+
+        Arguments:
+            path (str): Cache file
+        """
+        products = []
+        blocks = []
+        for product in self.catalogue.values():
+            products.append([product.product_id, len(product.sell_summary), len(product.buy_summary)])
+            blocks.append(array("d", [getattr(product, attribute) for attribute in Item.QUICK_STATUS_ATTRIBUTES]).tobytes())
+            blocks.extend(product.sell_summary.dump_bytes())
+            blocks.extend(product.buy_summary.dump_bytes())
+
+        metadata = json.dumps({
+            "timestamp": self.timestamp.timestamp(),
+            "capital": self.capital,
+            "products": products,
+            "best_flips": [[flip.product_id, flip.profit_per_hour, flip.imbalance, flip.risk_adjusted_profit] for flip in self.rank_flips()]
+            }).encode()
+
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(self.CACHE_HEADER.pack(self.CACHE_MAGIC, len(metadata)))
+            file.write(metadata)
+            file.writelines(blocks)
+        os.replace(temporary_path, path)
+
+    def load_cache(self, path: str) -> bool:
+        """
+        Restore the catalogue saved by save_cache, memory mapping the file so start up does not wait on parsing
+
+        Arguments:
+            path (str): Cache file
+
+        Returns:
+            bool: True if the cache was loaded, False if missing or unreadable
+        """
+        try:
+            with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, metadata_length = self.CACHE_HEADER.unpack_from(mapped, 0)
+                if magic != self.CACHE_MAGIC:
+                    logger.error(f"{path} is not a warm-start cache!")
+                    return False
+                position = self.CACHE_HEADER.size
+                metadata = json.loads(mapped[position:position + metadata_length])
+                position += metadata_length
+
+                catalogue = {}
+                quick_status_size = 8 * len(Item.QUICK_STATUS_ATTRIBUTES)
+                for product_id, sell_length, buy_length in metadata["products"]:
+                    product = Item(product_id)
+                    quick_status = array("d")
+                    quick_status.frombytes(mapped[position:position + quick_status_size])
+                    position += quick_status_size
+                    for attribute, value in zip(Item.QUICK_STATUS_ATTRIBUTES, quick_status):
+                        setattr(product, attribute, value)
+                    position = product.sell_summary.load_bytes(mapped, position, sell_length)
+                    position = product.buy_summary.load_bytes(mapped, position, buy_length)
+                    product.sell_curve.update()
+                    product.buy_curve.update()
+                    catalogue[product_id] = product
+
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            logger.error(f"Warm-start cache {path} could not be loaded: {e}")
+            return False
+
+        self.catalogue = catalogue
+        self.ranking = FlipRanking(self.ranking.key)
+        self.pruned = LiquidityIndex()
+        self.changed = set(catalogue)
+        self.timestamp = datetime.fromtimestamp(metadata["timestamp"])
+        self.from_cache = True
+        if metadata["capital"] == self.capital:#Flips are only valid for the capital they were scored with
+            self.cached_flips = [self.Flip(*flip) for flip in metadata["best_flips"]]
+        logger.info(f"Loaded {len(catalogue)} products from warm-start cache {path}")
+        return True
+
+    @dataclass
+    class CapitalSweep:
+        capitals: list
+        product_ids: list
+        profits: list#One row per product, one column per capital
+        best_flips: list#One list of Flip per capital, best first
+
+    def sweep_capitals(self, capitals: list) -> "Market.CapitalSweep":
+        """
+        Score every product at several capital values in a single pass over the catalogue
+
+        Every product's fill curve answers all capital values at once (see Item.calculate_profit_curve),
+        a bounded heap per capital keeps its MarketConfig.MAX_FLIPS_SHOWN best flips.
+
+        Arguments:
+            capitals (list[float]): Capital values to compare
+
+        Returns:
+            sweep (CapitalSweep): products x capitals profit per hour matrix and the best flips at each capital
+        """
+        product_ids = []
+        profits = []
+        best_flips = [[] for _ in capitals]
+        for product in self.catalogue.values():
+            if not product.is_tradeable():
+                continue
+
+            row = product.calculate_profit_curve(capitals)
+            imbalance = product.calculate_book_imbalance()
+            product_ids.append(product.product_id)
+            profits.append(row)
+            for heap, profit_per_hour in zip(best_flips, row):
+                if len(heap) < MarketConfig.MAX_FLIPS_SHOWN:
+                    heapq.heappush(heap, self.Flip(product.product_id, profit_per_hour, imbalance))
+                elif profit_per_hour > heap[0].profit_per_hour:
+                    heapq.heapreplace(heap, self.Flip(product.product_id, profit_per_hour, imbalance))
+
+        best_flips = [sorted(heap, reverse=True) for heap in best_flips]
+        return self.CapitalSweep(list(capitals), product_ids, profits, best_flips)
+
+    def scan_capital_levels(self, capitals: list) -> None:
+        """
+        Prints the best flips at every capital value, see sweep_capitals
+        """
+        sweep = self.sweep_capitals(capitals)
+        for capital, best_flips in zip(sweep.capitals, sweep.best_flips):
             if best_flips:
-                print(f"=== TOP {MarketConfig.MAX_FLIPS_SHOWN} BEST FLIPS ===")
+                print(f"=== TOP {MarketConfig.MAX_FLIPS_SHOWN} BEST FLIPS AT {capital:,.0f} COINS ===")
                 for flip in best_flips:
                     print(f"Potential flip: {flip.product_id}, Estimated revenue per hour: {flip.profit_per_hour}, imbalance: {flip.imbalance}")
             else:
-                print("No flips could be found!")
+                print(f"No flips could be found at {capital:,.0f} coins!")
+
+    @dataclass
+    class Order:
+        product_id: str
+        quantity: int
+        cost: float
+        average_price: float
+        profit_per_hour: float
+
+    def allocate_capital(self) -> list:
+        """
+        Split self.capital across products to maximise total profit per hour
+
+        Greedy over every product's fill curve: a priority queue holds the next listing each product
+        would fill, ranked by profit per coin, and the best listing is filled until capital runs out.
+        Each product is limited to its velocity cap and the depth of its buy summary.
+
+        Returns:
+            orders (list[Order]): Buy orders to place, most profitable first
+        """
+        candidates = []
+        for product in self.catalogue.values():
+            if not product.is_tradeable():
+                continue
+            velocity_quantity = product.calculate_velocity_cap()
+            price = product.fetch_quick_buy_cost() * (1 - MarketConfig.BAZAAR_TAX / 100)
+            if velocity_quantity > 0 and product.buy_curve.prices[0] < price:
+                candidates.append((-(price - product.buy_curve.prices[0]) / product.buy_curve.prices[0], product.product_id, 0, velocity_quantity, price))
+        heapq.heapify(candidates)
+
+        remaining_capital = self.capital
+        orders = {}
+        while candidates and remaining_capital > 0:
+            _, product_id, level, velocity_quantity, price = heapq.heappop(candidates)
+            curve = self.catalogue[product_id].buy_curve
+            listing_price = curve.prices[level]
+            listing_amount = int(curve.cumulative_amount[level] - (curve.cumulative_amount[level - 1] if level else 0))
+
+            quantity = min(listing_amount, velocity_quantity, math.floor(remaining_capital / listing_price))
+            if quantity <= 0:#Unaffordable, cheaper listings of other products may still fit
+                continue
+            remaining_capital -= quantity * listing_price
+            velocity_quantity -= quantity
+
+            order = orders.setdefault(product_id, self.Order(product_id, 0, 0.0, 0.0, 0.0))
+            order.quantity += quantity
+            order.cost += quantity * listing_price
+            order.profit_per_hour += quantity * (price - listing_price)
+
+            next_level = level + 1
+            if velocity_quantity > 0 and next_level < len(curve.prices) and curve.prices[next_level] < price:
+                next_price = curve.prices[next_level]
+                heapq.heappush(candidates, (-(price - next_price) / next_price, product_id, next_level, velocity_quantity, price))
+
+        for order in orders.values():
+            order.average_price = order.cost / order.quantity
+        return sorted(orders.values(), key=lambda order: order.profit_per_hour, reverse=True)
+
+    def print_allocation(self) -> None:
+        """
+        Prints the order list from allocate_capital
+        """
+        orders = self.allocate_capital()
+        if not orders:
+            print("No flips could be found!")
+            return
+
+        print(f"=== ORDER LIST FOR {self.capital:,.0f} COINS ===")
+        for order in orders:
+            print(f"Buy {order.quantity}x {order.product_id} at avg. {order.average_price:,.1f}, cost: {order.cost:,.0f}, estimated profit per hour: {order.profit_per_hour:,.0f}")
+        total_cost = sum(order.cost for order in orders)
+        total_profit = sum(order.profit_per_hour for order in orders)
+        print(f"Total cost: {total_cost:,.0f}, total estimated profit per hour: {total_profit:,.0f}")
+
+class FlipRanking:
+    """
+    Every scored product kept sorted by profit per hour, so a refresh only has to
+    reposition the products which changed instead of rebuilding the top flips from scratch.
+
+    Attributes:
+        key (str): Flip attribute ranked by, profit_per_hour unless ranking by risk_adjusted_profit
+        ordered (list): (score, product_id) pairs in ascending order
+        flips (dict): Index of the ranking, every key is a product_id, keys map to the product's Flip
+    """
+    def __init__(self, key: str = "profit_per_hour"):
+        self.key = key
+        self.ordered = []
+        self.flips = {}
+
+    def __len__(self) -> int:
+        return len(self.flips)
+
+    def update(self, flip: "Market.Flip") -> None:
+        """Insert the flip, replacing the product's previous flip if it was already ranked"""
+        self.remove(flip.product_id)
+        self.flips[flip.product_id] = flip
+        bisect.insort(self.ordered, (getattr(flip, self.key), flip.product_id))
+
+    def remove(self, product_id: str) -> None:
+        flip = self.flips.pop(product_id, None)
+        if flip is None:
+            return
+        key = (getattr(flip, self.key), product_id)
+        del self.ordered[bisect.bisect_left(self.ordered, key)]
+
+    def top(self, k: int) -> list:
+        """
+        Returns:
+            best_flips (list[Flip]): The k most profitable flips, best first
+        """
+        return [self.flips[product_id] for _, product_id in reversed(self.ordered[-k:])] if k > 0 else []
+
+    def threshold(self, k: int) -> float:
+        """
+        Returns:
+            score (float): Score of the k-th best flip, -inf while fewer than k flips are ranked
+        """
+        return self.ordered[-k][0] if 0 < k <= len(self.ordered) else float("-inf")
+
+class LiquidityIndex:
+    """
+    Unscored products kept sorted by an upper bound on their profit per hour, so the scanner
+    only has to score the products which could still enter the top flips.
+
+    Attributes:
+        ordered (list): (profit_bound, product_id) pairs in ascending order
+        bounds (dict): Every key is a product_id, keys map to the product's profit bound
+    """
+    def __init__(self):
+        self.ordered = []
+        self.bounds = {}
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def update(self, product_id: str, profit_bound: float) -> None:
+        self.remove(product_id)
+        self.bounds[product_id] = profit_bound
+        bisect.insort(self.ordered, (profit_bound, product_id))
+
+    def remove(self, product_id: str) -> None:
+        profit_bound = self.bounds.pop(product_id, None)
+        if profit_bound is None:
+            return
+        del self.ordered[bisect.bisect_left(self.ordered, (profit_bound, product_id))]
+
+    def best_bound(self) -> float:
+        return self.ordered[-1][0]
+
+    def pop_best(self) -> str:
+        """
+        Returns:
+            product_id (str): The product with the highest bound, removed from the index
+        """
+        _, product_id = self.ordered.pop()
+        del self.bounds[product_id]
+        return product_id
 
 class Item:
     """
@@ -116,147 +544,185 @@ class Item:
 
     Holds financial methods
 
+    Uses __slots__ and fixed-type arrays which are updated in place on every refresh,
+    so no per-listing objects are kept alive between refreshes.
+
     Attributes:
         product_id (str): Product Name
-        sell_summary (dict): Holds details about all active sell orders
-        buy_summary (dict): Holds details about all active buy orders
-        quick_status (dict): Holds basic market data about the object 
+        sell_summary (Summary): Holds details about all active sell orders
+        buy_summary (Summary): Holds details about all active buy orders
+        sell_price, sell_volume, sell_moving_week, sell_orders (float): Quick status of the sell side
+        buy_price, buy_volume, buy_moving_week, buy_orders (float): Quick status of the buy side
+        sell_curve (FillCurve): Cumulative depth of the refined sell summary
+        buy_curve (FillCurve): Cumulative depth of the refined buy summary
+        fingerprint (int): Hash of the quick status and top of the book the item was last refined from
+        stats (RollingStats): Statistics over the snapshots the item was updated with
         """
-    def __init__(self, product_id, product_data):
+    __slots__ = ("product_id", "sell_summary", "buy_summary",
+                 "sell_price", "sell_volume", "sell_moving_week", "sell_orders",
+                 "buy_price", "buy_volume", "buy_moving_week", "buy_orders",
+                 "sell_curve", "buy_curve", "fingerprint", "stats")
+    QUICK_STATUS_ATTRIBUTES = ("sell_price", "sell_volume", "sell_moving_week", "sell_orders",
+                               "buy_price", "buy_volume", "buy_moving_week", "buy_orders")
+
+    def __init__(self, product_id, product_data: dict = None):
         self.product_id = product_id
-        self.sell_summary = product_data["sell_summary"]
-        self.buy_summary = product_data["buy_summary"]
-        self.quick_status = product_data["quick_status"]
+        self.sell_summary = Summary()
+        self.buy_summary = Summary()
+        self.sell_curve = FillCurve(self.sell_summary)
+        self.buy_curve = FillCurve(self.buy_summary)
+        self.fingerprint = None
+        self.stats = RollingStats()
+        for attribute in self.QUICK_STATUS_ATTRIBUTES:
+            setattr(self, attribute, 0.0)
+        if product_data is not None:
+            self.update_item(product_data)
 
     #Object management methods
-    def update_item(self, product_data: dict) -> None:
+    def update_item(self, product_data: dict) -> bool:
         """
         Copy the updated data into itself, then format the data to be more accurate
+
+        Skipped if the quick status and top of the book are unchanged since the last update,
+        the rolling statistics still record the snapshot
         
         Arguments:
-            product_data (Dict): The new product data fetched from API"""
-        
+            product_data (Dict): The new product data fetched from API
+
+        Returns:
+            bool: True if the item changed, False otherwise"""
+        fingerprint = self.calculate_fingerprint(product_data)
+        if fingerprint == self.fingerprint:
+            self.record_statistics()
+            return False
+
+        self.fingerprint = fingerprint
+        self.sell_summary.load(product_data["sell_summary"])
+        self.buy_summary.load(product_data["buy_summary"])
 
-        self.sell_summary = product_data["sell_summary"]
-        self.buy_summary = product_data["buy_summary"]
-        self.quick_status = product_data["quick_status"]     
+        quick_status = product_data["quick_status"]
+        self.sell_price = quick_status["sellPrice"]
+        self.sell_volume = quick_status["sellVolume"]
+        self.sell_moving_week = quick_status["sellMovingWeek"]
+        self.sell_orders = quick_status["sellOrders"]
+        self.buy_price = quick_status["buyPrice"]
+        self.buy_volume = quick_status["buyVolume"]
+        self.buy_moving_week = quick_status["buyMovingWeek"]
+        self.buy_orders = quick_status["buyOrders"]
         self.refine_item()   
+        self.record_statistics()
+        return True
+
+    def record_statistics(self) -> None:
+        """Add the current snapshot to the rolling statistics, products without a book on both sides are not recorded"""
+        if not self.is_tradeable():
+            return
+        self.stats.update(self.buy_price * (1 - MarketConfig.BAZAAR_TAX / 100) - self.buy_summary.prices[0])
+
+    @staticmethod
+    def calculate_fingerprint(product_data: dict) -> int:
+        """
+        Only the first MarketConfig.FINGERPRINT_DEPTH listings of each summary are hashed,
+        deeper changes are picked up once the top of the book moves
+        """
+        depth = MarketConfig.FINGERPRINT_DEPTH
+        quick_status = tuple(product_data["quick_status"].values())
+        top_sells = tuple(tuple(listing.values()) for listing in product_data["sell_summary"][:depth])
+        top_buys = tuple(tuple(listing.values()) for listing in product_data["buy_summary"][:depth])
+        return hash((quick_status, top_sells, top_buys))
 
     def refine_item(self) -> None:
         """For every listing in an item's summary, remove all suspicious orders and group together similar orders"""
-        self.sell_summary = self.remove_suspicious_orders(self.sell_summary)
-        self.buy_summary = self.remove_suspicious_orders(self.buy_summary)
-        self.sell_summary = self.group_similar_orders(self.sell_summary)
-        self.buy_summary = self.group_similar_orders(self.buy_summary)
-
-    @dataclass
-    class Bundle:
-        amount: int
-        total_valuation: float
-        orders: int 
+        self.remove_suspicious_orders(self.sell_summary)
+        self.remove_suspicious_orders(self.buy_summary)
+        self.group_similar_orders(self.sell_summary)
+        self.group_similar_orders(self.buy_summary)
+        self.sell_curve.update()
+        self.buy_curve.update()
 
-    def group_similar_orders(self, summary: dict) -> list:
+    def group_similar_orders(self, summary: "Summary") -> None:
         """
         Players often bet +/- 0.1 coins on the orderbook to have their order fulfilled
         quicker, grouped data gives better information about the volume at a price   
 
+        Listings are compared against the top price of the book and merged in a single pass,
+        bundles are written back over the listings already read
+
         Arguments:
-            summary (dict): Buy/Sell Summary 
-        
-        Returns:
-            summary (dict): The same Buy/Sell Summary, grouped
-        """https://discord.com/developers/docs/quick-start/getting-started
-        if len(summary) <= 1:
-            return summary
-        
-        final_summary = []
-        new_bundle = self.Bundle(0, 0, 0)
-        target_price = summary[0]["pricePerUnit"]
-        for listing in summary:
-            amount = listing["amount"]
-            price = listing["pricePerUnit"]
-            orders = listing["orders"]
-            if self.check_similar_orders(target_price, price):
-                new_bundle.amount += amount
-                new_bundle.total_valuation += (price * amount)#So avg. is weighted by amount
-                new_bundle.orders += orders
-            else:
-                grouped_orders = self.create_bundle(new_bundle)
-                final_summary.append(grouped_orders)
-                new_bundle = self.Bundle(amount, price*amount, orders)
-        
-        grouped_orders = self.create_bundle(new_bundle)
-        final_summary.append(grouped_orders)
-        return final_summary
+            summary (Summary): Buy/Sell Summary, grouped in place
+        """
+        length = len(summary)
+        if length <= 1:
+            return
 
-    def check_similar_orders(self, price1: float, price2: float) -> bool:
-        if self.calculate_percentage_difference(price1, price2) < MarketConfig.SAME_ORDER_THRESHOLD:
-            return True
-        else:
-            return False
+        prices = summary.prices
+        amounts = summary.amounts
+        orders = summary.orders
+        threshold = MarketConfig.SAME_ORDER_THRESHOLD
+        target_price = prices[0]
+        written = 0
+        bundle_amount = bundle_valuation = bundle_orders = 0
+        for index in range(length):
+            amount = amounts[index]
+            price = prices[index]
+            order_count = orders[index]
+            total = target_price + price
+            if total and abs((target_price - price) / abs(total / 2)) * 100 < threshold:#Percentage difference from the pair's mean
+                bundle_amount += amount
+                bundle_valuation += (price * amount)#So avg. is weighted by amount
+                bundle_orders += order_count
+            else:
+                prices[written] = bundle_valuation / bundle_amount
+                amounts[written] = bundle_amount
+                orders[written] = bundle_orders
+                written += 1
+                bundle_amount, bundle_valuation, bundle_orders = amount, price * amount, order_count
 
-    def create_bundle(self, bundle: Bundle) -> dict:
-        average_price = bundle.total_valuation / bundle.amount
-        return {
-            "amount": bundle.amount,
-            "pricePerUnit" : average_price,
-            "order": bundle.orders
-            }
+        prices[written] = bundle_valuation / bundle_amount
+        amounts[written] = bundle_amount
+        orders[written] = bundle_orders
+        summary.resize(written + 1)
 
-    def remove_suspicious_orders(self, summary: dict) -> dict:
+    def remove_suspicious_orders(self, summary: "Summary") -> None:
         """
         Removes orders from the book by checking if the next item has a high difference in value AND much fewer people placing the order
 
         Strictness is dependant on MarketConfig.MANIPULATED_PRICE_THRESHOLD and MANIPULATED_ORDER_THRESHOLD
 
-        Recursively checks elements if the top is manipulated to ensure that all manipulated listings have been removed.
+        Walks down the book until two consecutive listings are consistent, then drops
+        every manipulated listing at the top at once, in linear time.
 
         Arguments:
-            summary (dict): The Buy/Sell Summary being checked for manipulation
-
-        Returns:
-            summary (dict): The same summary but with suspicious listings eliminated
-        the bottom item is potentially manipulated so recurse until two consecutive listings are consistent."""
-                
-        if len(summary) <= 1:
-            return summary
-        
-        order1 = summary[0]
-        order2 = summary[1]
+            summary (Summary): The Buy/Sell Summary being checked for manipulation, cleaned in place
+        """
+        length = len(summary)
+        if length <= 1:
+            return
 
-        if self.check_for_manipulation(order1, order2):
-            return self.remove_suspicious_orders(summary[1:])#recurse until top value is consistent with second top
-        else:
-            return summary
+        prices = summary.prices
+        amounts = summary.amounts
+        start = 0
+        while start < length - 1 and self.check_for_manipulation(prices[start], prices[start + 1], amounts[start], amounts[start + 1]):
+            start += 1
+        if start:
+            summary.drop_top(start)
     
-    def check_for_manipulation(self, order1: dict, order2: dict) -> bool:
+    def check_for_manipulation(self, first_price: float, second_price: float, num_order1: int, num_order2: int) -> bool:
         """
         Note: heuristic approach. Success depends on how accurate the config values are,
         there will be false positives and false negatives.
         If one listing has much less orders(not to be confused with amount) and one listing is much cheaper/expensive,
         It is likely manipulated.
         """
-        first_price = order1["pricePerUnit"]
-        second_price = order2["pricePerUnit"]
-        num_order1 = order1["amount"]
-        num_order2 = order2["amount"]
-
-        if self.calculate_percentage_difference(first_price, second_price) > MarketConfig.MANIPULATED_PRICE_THRESHOLD:
-            if self.calculate_percentage_difference(num_order1, num_order2) > MarketConfig.MANIPULATED_ORDER_THRESHOLD:
-                return True
-        return False
+        #Percentage difference from the pair's mean, a zero denominator counts as an infinite difference
+        total_price = first_price + second_price
+        if total_price and abs((first_price - second_price) / abs(total_price / 2)) * 100 <= MarketConfig.MANIPULATED_PRICE_THRESHOLD:
+            return False
+        total_orders = num_order1 + num_order2
+        if total_orders and abs((num_order1 - num_order2) / abs(total_orders / 2)) * 100 <= MarketConfig.MANIPULATED_ORDER_THRESHOLD:
+            return False
+        return True
     
-    @staticmethod
-    def calculate_percentage_difference(val1: float|int, val2: float|int) -> float:
-        try:
-            return abs((val1 - val2) / abs((val1 + val2) / 2)) * 100
-        except:
-            if not isinstance(val1, (int, float)) or not isinstance(val2, (int, float)):
-                logger.error(f"Calculation between {val1} and {val2} failed as invalid datatype!")
-            if val2 == 0:
-                logger.error(f"Calculation between {val1} and {val2} failed as val2 = 0!")
-            return float("inf")
-        
     #Financial Methods
     def is_tradeable(self) -> bool:
         """
@@ -269,31 +735,25 @@ class Item:
 
     def fetch_cost(self) -> float:
         if self.buy_summary:
-            top_listing = self.buy_summary[0]
-            return top_listing["pricePerUnit"] 
+            return self.buy_summary.prices[0]
 
     def fetch_price(self) -> float:
         if self.sell_summary:
-            top_listing = self.sell_summary[0]
-            return top_listing["pricePerUnit"]
+            return self.sell_summary.prices[0]
         
     def fetch_quick_sell_cost(self) -> float:
-        if self.quick_status:
-            return self.quick_status["sellPrice"]
+        return self.sell_price
     
     def fetch_quick_buy_cost(self) -> float:
-        if self.quick_status:
-            return self.quick_status["buyPrice"]
+        return self.buy_price
         
     def fetch_buy_volume(self) -> float:
         if self.buy_summary:
-            top_listing = self.buy_summary[0]
-            return top_listing["amount"]  
+            return self.buy_summary.amounts[0]
             
     def fetch_sell_volume(self) -> float:
         if self.sell_summary:
-            top_listing = self.sell_summary[0]
-            return top_listing["amount"]  
+            return self.sell_summary.amounts[0]
     
     def calculate_max_buy_volume(self, capital: float) -> int:
         """
@@ -307,37 +767,23 @@ class Item:
         Returns:
             total_quantity (int): The max number of items the player can buy
         """
-        remaining_capital = capital
-        total_quantity = 0
-        
-        for order in self.buy_summary:  
-            price = order["pricePerUnit"]
-            amount = order["amount"]
-            
-            affordable = math.floor(remaining_capital / price)
-            take = min(affordable, amount)
-            
-            total_quantity += take
-            remaining_capital -= take * price
-            
-            if remaining_capital <= 0:
-                break
-        
-        return total_quantity
+        return self.buy_curve.fillable_quantity(capital)
 
     def calculate_affordable_quantity(self, capital: float) -> int:#1,000,000
-        quantity = math.floor(capital / self.fetch_cost())
-        return quantity
+        """
+        Limited by the depth of the buy summary, not just the top listing
+        """
+        return self.calculate_max_buy_volume(capital)
 
     def calculate_sales_velocity(self) -> float:
 
-        return (self.quick_status["buyMovingWeek"] / MarketConfig.HOURS_IN_WEEK)
+        return (self.buy_moving_week / MarketConfig.HOURS_IN_WEEK)
     
     def calculate_purchase_velocity(self) -> float:
         """
         Calculates buy orders fulfilled per week
         """
-        return (self.quick_status["sellMovingWeek"] / MarketConfig.HOURS_IN_WEEK)
+        return (self.sell_moving_week / MarketConfig.HOURS_IN_WEEK)
     
     def calculate_velocity_cap(self) -> int:
         """
@@ -358,9 +804,9 @@ class Item:
 
     def calculate_absolute_profit(self, capital:float) -> float:
         quantity = self.calculate_affordable_quantity(capital)
-        cost = self.fetch_cost()
+        cost = self.buy_curve.cost_of_quantity(quantity)
         price = self.fetch_quick_buy_cost() * (1 - MarketConfig.BAZAAR_TAX/100)
-        return (price - cost) * quantity
+        return price * quantity - cost
     
     def calculate_percentage_profit(self) -> float:
         cost = self.fetch_cost()
@@ -369,11 +815,56 @@ class Item:
 
     def calculate_profit_per_hour(self, capital: float) -> float:
         quantity = self.calculate_velocity_limited_quantity(capital)
-        cost = self.fetch_cost()
+        cost = self.buy_curve.cost_of_quantity(quantity)#Deeper listings are filled at their own price
+        price = self.fetch_quick_buy_cost() * (1 - MarketConfig.BAZAAR_TAX / 100)
+        return price * quantity - cost
+
+    def calculate_profit_curve(self, capitals: list) -> list:
+        """
+        calculate_profit_per_hour for many capital values in one call
+
+        Arguments:
+            capitals (list[float]): Capital values to evaluate
+
+        Returns:
+            profits (list[float]): Profit per hour at each capital value, in the same order
+        """
+        velocity_quantity = self.calculate_velocity_cap()
         price = self.fetch_quick_buy_cost() * (1 - MarketConfig.BAZAAR_TAX / 100)
-        profit_per_item = price - cost
-        return profit_per_item * quantity
+        profits = []
+        for fill in self.buy_curve.simulate_many(capitals):
+            quantity = min(fill.quantity, velocity_quantity)
+            profits.append(price * quantity - self.buy_curve.cost_of_quantity(quantity))
+        return profits
     
+    def calculate_profit_bound(self) -> float:
+        """
+        Cheap upper bound on calculate_profit_per_hour and calculate_risk_adjusted_profit at any capital:
+        no more than the velocity cap can be flipped, and none of it can be bought below the cheapest listing
+
+        Returns:
+            profit_bound (float): velocity cap * (net sale price - cheapest buy listing), 0 if that margin is not positive
+        """
+        margin = self.fetch_quick_buy_cost() * (1 - MarketConfig.BAZAAR_TAX / 100) - min(self.buy_summary.prices)
+        return self.calculate_velocity_cap() * margin if margin > 0 else 0.0
+
+    def calculate_risk_adjusted_profit(self, capital: float, profit_per_hour: float = None) -> float:
+        """
+        Profit per hour scaled by how often the flip was recently profitable and shrunk by how much its spread moves,
+        so a flip which briefly spikes ranks below a stable one
+
+        Arguments:
+            profit_per_hour (float): Reused if already calculated for this capital
+
+        Returns:
+            risk_adjusted_profit (float): profit_per_hour * persistence / (1 + RISK_AVERSION * volatility), losses are not discounted
+        """
+        if profit_per_hour is None:
+            profit_per_hour = self.calculate_profit_per_hour(capital)
+        if profit_per_hour <= 0:
+            return profit_per_hour
+        return profit_per_hour * self.stats.persistence() / (1 + MarketConfig.RISK_AVERSION * self.stats.volatility())
+
     def calculate_book_imbalance(self) -> str:
         """
         Uses book imbalance formula to predict if an item's value will rise or fall
@@ -397,6 +888,256 @@ class Item:
             elif 0.33 <= imbalance <= 1.0:
                 return "Heavy buy"#Prices likely to fall
 
+class Summary:
+    """
+    One side of a product's order book as parallel fixed-type arrays, one entry per listing in book order.
+
+    Attributes:
+        prices (array): Price per unit of every listing
+        amounts (array): Items in every listing
+        orders (array): Number of orders in every listing
+    """
+    __slots__ = ("prices", "amounts", "orders")
+
+    def __init__(self):
+        self.prices = array("d")
+        self.amounts = array("q")
+        self.orders = array("q")
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def load(self, listings: list) -> None:
+        """
+        Overwrite the arrays in place with the listings fetched from the API
+
+        Arguments:
+            listings (list[dict]): Raw Buy/Sell Summary
+        """
+        self.resize(len(listings))
+        prices = self.prices
+        amounts = self.amounts
+        orders = self.orders
+        for index, listing in enumerate(listings):
+            prices[index] = listing["pricePerUnit"]
+            amounts[index] = listing["amount"]
+            orders[index] = listing["orders"]
+
+    def resize(self, length: int) -> None:
+        if len(self.prices) > length:
+            del self.prices[length:]
+            del self.amounts[length:]
+            del self.orders[length:]
+        elif len(self.prices) < length:
+            missing = length - len(self.prices)
+            self.prices.extend(array("d", bytes(8 * missing)))
+            self.amounts.extend(array("q", bytes(8 * missing)))
+            self.orders.extend(array("q", bytes(8 * missing)))
+
+    def drop_top(self, count: int) -> None:
+        """Remove the first count listings"""
+        del self.prices[:count]
+        del self.amounts[:count]
+        del self.orders[:count]
+
+    def dump_bytes(self) -> list:
+        """
+        Returns:
+            blocks (list[bytes]): Raw prices, amounts and orders, see load_bytes
+        """
+        return [self.prices.tobytes(), self.amounts.tobytes(), self.orders.tobytes()]
+
+    def load_bytes(self, buffer, position: int, length: int) -> int:
+        """
+        Overwrite the arrays from the raw bytes written by dump_bytes
+
+        Arguments:
+            buffer (bytes | mmap): Holds the raw arrays
+            position (int): Offset of the first array in the buffer
+            length (int): Number of listings
+
+        Returns:
+            position (int): Offset just after the last array
+        """
+        for values in (self.prices, self.amounts, self.orders):
+            del values[:]
+            values.frombytes(buffer[position:position + 8 * length])
+            position += 8 * length
+        return position
+
+    def listings(self) -> list:
+        """
+        Returns:
+            listings (list[dict]): The summary in the API's format
+        """
+        return [{"amount": amount, "pricePerUnit": price, "orders": order_count}
+                for price, amount, order_count in zip(self.prices, self.amounts, self.orders)]
+
+class FillCurve:
+    """
+    Cumulative depth of one side of the book, rebuilt in place once per refresh.
+
+    Listings are filled in book order, so any fill can be answered by binary search
+    over the running totals instead of walking the book.
+
+    Attributes:
+        prices (array): Price per unit of every listing, in book order, shared with the Summary
+        cumulative_amount (array): Items available up to and including each listing
+        cumulative_cost (array): Coins needed to fill everything up to and including each listing
+    """
+    __slots__ = ("summary", "prices", "cumulative_amount", "cumulative_cost")
+
+    def __init__(self, summary: Summary):
+        self.summary = summary
+        self.prices = summary.prices
+        self.cumulative_amount = array("d")
+        self.cumulative_cost = array("d")
+        self.update()
+
+    def update(self) -> None:
+        """Recalculate the running totals after the summary changed"""
+        length = len(self.summary)
+        for values in (self.cumulative_amount, self.cumulative_cost):
+            if len(values) > length:
+                del values[length:]
+            elif len(values) < length:
+                values.extend(array("d", bytes(8 * (length - len(values)))))
+
+        prices = self.prices
+        amounts = self.summary.amounts
+        cumulative_amount = self.cumulative_amount
+        cumulative_cost = self.cumulative_cost
+        total_amount = 0
+        total_cost = 0.0
+        for index in range(length):
+            total_amount += amounts[index]
+            total_cost += prices[index] * amounts[index]
+            cumulative_amount[index] = total_amount
+            cumulative_cost[index] = total_cost
+
+    @dataclass
+    class Fill:
+        quantity: int
+        cost: float
+        average_price: float
+        slippage: float
+
+    def fillable_quantity(self, capital: float) -> int:
+        """
+        Arguments:
+            capital (float): Coins available
+
+        Returns:
+            quantity (int): Max items fillable, every complete listing plus part of the next one
+        """
+        level = bisect.bisect_right(self.cumulative_cost, capital)#Listings which can be filled completely
+        quantity = self.cumulative_amount[level - 1] if level else 0
+        if level < len(self.prices):
+            remaining_capital = capital - (self.cumulative_cost[level - 1] if level else 0.0)
+            listing_amount = self.cumulative_amount[level] - quantity
+            quantity += max(0, min(math.floor(remaining_capital / self.prices[level]), listing_amount))
+        return int(quantity)
+
+    def cost_of_quantity(self, quantity: int) -> float:
+        """
+        Arguments:
+            quantity (int): Items to fill, capped at the depth of the book
+
+        Returns:
+            cost (float): Coins needed to fill the quantity
+        """
+        if quantity <= 0 or not self.prices:
+            return 0.0
+        level = bisect.bisect_left(self.cumulative_amount, quantity)#Listing the last item is filled from
+        if level == len(self.prices):
+            return self.cumulative_cost[-1]
+        previous_amount = self.cumulative_amount[level - 1] if level else 0
+        previous_cost = self.cumulative_cost[level - 1] if level else 0.0
+        return previous_cost + (quantity - previous_amount) * self.prices[level]
+
+    def simulate_quantity(self, quantity: int) -> "FillCurve.Fill":
+        """
+        Returns:
+            fill (Fill): Cost, average price and slippage (% away from the top listing) of filling the quantity
+        """
+        if not self.prices:#Nothing to fill on an empty book
+            return self.Fill(0, 0.0, 0.0, 0.0)
+        quantity = min(quantity, int(self.cumulative_amount[-1]))
+        if quantity <= 0:
+            return self.Fill(0, 0.0, 0.0, 0.0)
+        cost = self.cost_of_quantity(quantity)
+        average_price = cost / quantity
+        slippage = abs(average_price - self.prices[0]) / self.prices[0] * 100
+        return self.Fill(quantity, cost, average_price, slippage)
+
+    def simulate(self, capital: float) -> "FillCurve.Fill":
+        return self.simulate_quantity(self.fillable_quantity(capital))
+
+    def simulate_many(self, capitals: list) -> list:
+        """
+        Arguments:
+            capitals (list[float]): Capital values to fill
+
+        Returns:
+            fills (list[Fill]): The fill for each capital value, in the same order
+        """
+        return [self.simulate(capital) for capital in capitals]
+
+class RollingStats:
+    """
+    Per-product statistics of the spread over recent snapshots, updated in O(1) per snapshot.
+
+    An exponentially weighted mean and variance of the spread feed volatility, a ring buffer of
+    the last MarketConfig.STATS_WINDOW spreads tracks how persistently the flip is profitable.
+
+    Attributes:
+        mean (float): EWMA of the spread
+        variance (float): Exponentially weighted variance of the spread
+        spreads (array): Ring buffer of the last spreads, NaN until filled
+        position (int): Index in spreads written next
+        count (int): Snapshots recorded, up to the window size
+        profitable (int): Spreads in the ring buffer above zero
+    """
+    __slots__ = ("mean", "variance", "spreads", "position", "count", "profitable")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.spreads = array("d", [float("nan")]) * MarketConfig.STATS_WINDOW
+        self.position = 0
+        self.count = 0
+        self.profitable = 0
+
+    def update(self, spread: float) -> None:
+        """
+        Arguments:
+            spread (float): The snapshot's margin per unit after tax
+        """
+        if self.count == 0:#First snapshot seeds the average
+            self.mean = spread
+        else:
+            alpha = MarketConfig.STATS_ALPHA
+            delta = spread - self.mean
+            self.mean += alpha * delta
+            self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+
+        spreads = self.spreads
+        if self.count == len(spreads):#Full, the oldest spread drops out
+            self.profitable -= spreads[self.position] > 0
+        else:
+            self.count += 1
+        spreads[self.position] = spread
+        self.profitable += spread > 0
+        self.position = (self.position + 1) % len(spreads)
+
+    def persistence(self) -> float:
+        """Share of the recent snapshots in which the flip had a positive spread"""
+        return self.profitable / self.count if self.count else 0.0
+
+    def volatility(self) -> float:
+        """Coefficient of variation of the spread, so a spike over a thin average margin counts as volatile"""
+        return math.sqrt(self.variance) / max(abs(self.mean), 1e-9)
+
 @dataclass
 class MarketConfig:
     """
@@ -408,6 +1149,23 @@ class MarketConfig:
         MANIPULATED_ORDER_THRESHOLD (float): If percentage difference > X% disregard order
         HOURS_IN_WEEK (int): Number of hours in a week
         MAX_FLIPS_SHOWN (int): Max number of flips shown on a scan
+        DEFAULT_CAPITAL (float): Coins at risk if no capital is given
+        CACHE_PATH (str): Warm-start cache file, see Market.save_cache
+        API_URL (str): Bazaar endpoint fetched when no other URL is given, see mock_server.py for a local one
+        FEED_MIN_CHANGE (float): Percent change in profit per hour before a flip is updated on the JSONL feed, see feed.py
+        STATS_ALPHA (float): Weight of the newest snapshot in every product's exponentially weighted statistics
+        STATS_WINDOW (int): Number of snapshots a product's spread persistence is measured over
+        RISK_AVERSION (float): How strongly spread volatility is penalised when ranking by risk adjusted profit
+        AUCTION_URL (str): Auction house endpoint swept for cross-market flips, see AuctionScraper
+        AUCTION_CONCURRENCY (int): Max auction pages fetched at once, above the auction house's page count so a sweep is one round
+        AUCTION_DATA_TTL (int): auction house data is stale after X seconds
+        AUCTION_TAX (float): Percent tax placed on auction house sales
+        FINGERPRINT_DEPTH (int): Number of top listings per summary checked for changes on refresh
+        REQUEST_TIMEOUT (tuple): Seconds to wait for the API to connect and to send data
+        MAX_RETRIES (int): Number of times a failed fetch is retried before giving up
+        RETRY_BACKOFF (float): Seconds waited before the first retry, doubled on every further retry
+        MIN_POLL_INTERVAL (float): Min seconds between two fetches, even if upstream data is already stale
+        MAX_BACKOFF (float): Max seconds waited between fetches while the API keeps failing
     """
 
     DATA_TTL = 15 
@@ -417,6 +1175,23 @@ class MarketConfig:
     MANIPULATED_ORDER_THRESHOLD = 200
     HOURS_IN_WEEK = 168
     MAX_FLIPS_SHOWN = 10
+    DEFAULT_CAPITAL = 1000000000.0#1,000,000,000
+    CACHE_PATH = "bazaar_cache.bin"
+    API_URL = "https://api.hypixel.net/skyblock/bazaar"
+    FEED_MIN_CHANGE = 1.0
+    STATS_ALPHA = 0.05
+    STATS_WINDOW = 120#30 minutes of 15 second snapshots
+    RISK_AVERSION = 1.0
+    AUCTION_URL = "https://api.hypixel.net/skyblock/auctions"
+    AUCTION_CONCURRENCY = 64
+    AUCTION_DATA_TTL = 60
+    AUCTION_TAX = 1.0
+    FINGERPRINT_DEPTH = 5
+    REQUEST_TIMEOUT = (5, 15)
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.5
+    MIN_POLL_INTERVAL = 1.0
+    MAX_BACKOFF = 300.0
 
 class Scraper:
     """
@@ -424,34 +1199,114 @@ class Scraper:
 
     Note that Bazaar API only suppports fetching of whole database
 
+    Keeps one keep-alive session open, negotiates compression, retries transient failures
+    and compacts every product once the whole response has been decoded.
+
     Attributes:
         url (str): The URL being fetched from
+        last_updated (int): Upstream "lastUpdated" of the last successful fetch, in milliseconds since epoch
+        session (Session): Persistent HTTP session reused by every fetch
         """
-    def __init__(self):
-        self.url = "https://api.hypixel.net/skyblock/bazaar"
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, url: str = None):
+        self.url = url or MarketConfig.API_URL
+        self.last_updated = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)#Local stand-in servers
+        self.session.headers.update(make_headers(keep_alive=True, accept_encoding=True))#gzip/deflate, plus br if brotli is installed
 
     def fetch_catalogue(self) -> dict:
         """
         Scrape the API, returning only the products if successful.
 
+        Connection errors, timeouts, RETRY_STATUSES and truncated or invalid bodies are retried
+        up to MarketConfig.MAX_RETRIES times with jittered exponential backoff.
+
         Returns:
             product_data(dict): All products if successful, otherwise empty
         """
-        try:
-            response = requests.get(self.url)
-            response.raise_for_status()
+        for attempt in range(MarketConfig.MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(self.calculate_retry_delay(attempt))
+            try:
+                request_start = time.perf_counter()
+                with self.session.get(self.url, timeout=MarketConfig.REQUEST_TIMEOUT, stream=True) as response:
+                    metrics.observe("phase_seconds", time.perf_counter() - request_start, phase="fetch")#Until the headers arrive, the body is read by parse
+                    if response.status_code in self.RETRY_STATUSES:
+                        metrics.increment("api_errors_total", reason=f"status_{response.status_code}")
+                        logger.warning(f"API responded with {response.status_code}, attempt {attempt + 1}/{MarketConfig.MAX_RETRIES + 1}")
+                        continue
+                    response.raise_for_status()
+                    try:
+                        with metrics.time_phase("parse"):#Includes downloading the body
+                            bazaar_products = self.parse_response(response)
+                    except ValueError as e:#Includes requests.JSONDecodeError, a complete body which is not valid JSON
+                        metrics.increment("validation_failures_total", reason="invalid_json")
+                        logger.warning(f"API response could not be parsed ({e}), attempt {attempt + 1}/{MarketConfig.MAX_RETRIES + 1}")
+                        continue
 
-            bazaar_products = response.json()
-            if self.__validate_api_response(bazaar_products):
-                logger.info("Catalogue successfully fetched from API!")
-                return bazaar_products["products"]
-            else:
-                logger.error("Could not fetch catalogue from API!")
+                if self.__validate_api_response(bazaar_products):
+                    logger.info("Catalogue successfully fetched from API!")
+                    self.last_updated = bazaar_products["lastUpdated"]
+                    return bazaar_products["products"]
+                else:
+                    logger.error("Could not fetch catalogue from API!")
+                    return {}
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.increment("api_errors_total", reason="timeout" if isinstance(e, requests.Timeout) else "connection")
+                logger.warning(f"Fetching from API failed with {e}, attempt {attempt + 1}/{MarketConfig.MAX_RETRIES + 1}")
+
+            except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError) as e:#A body cut off mid-transfer
+                metrics.increment("api_errors_total", reason="truncated_body")
+                logger.warning(f"API response was cut off ({e}), attempt {attempt + 1}/{MarketConfig.MAX_RETRIES + 1}")
+
+            except Exception as e:
+                metrics.increment("api_errors_total", reason="unknown")
+                logger.error(f"Unknown error {e} has occured while fetching from API!")
                 return {}
 
-        except Exception as e:
-            logger.error(f"Unknown error {e} has occured while fetching from API!")
-            return {}
+        metrics.increment("api_errors_total", reason="retries_exhausted")
+        logger.error(f"Could not fetch catalogue from API after {MarketConfig.MAX_RETRIES + 1} attempts!")
+        return {}
+
+    @staticmethod
+    def calculate_retry_delay(attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, MarketConfig.RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    def parse_response(self, response: requests.Response) -> dict:
+        """
+        Decode the whole API response, then compact every product
+
+        The json module's C parser beats any event-driven streaming parser here, as every
+        event of the response would pass through Python.
+
+        Returns:
+            bazaar_products (dict): The response with compacted products, see compact_product
+        """
+        bazaar_products = response.json()
+        if isinstance(bazaar_products, dict) and isinstance(bazaar_products.get("products"), dict):
+            bazaar_products["products"] = {product_id: self.compact_product(product_data)
+                                           for product_id, product_data in bazaar_products["products"].items()}
+        return bazaar_products
+
+    @staticmethod
+    def compact_product(product_data: dict) -> dict:
+        """
+        Keep only what Item uses, dropping the product ids repeated inside every product
+        """
+        quick_status = product_data["quick_status"]
+        quick_status.pop("productId", None)
+        return {
+            "quick_status": quick_status,
+            "sell_summary": product_data["sell_summary"],
+            "buy_summary": product_data["buy_summary"]
+            }
      
     def __validate_api_response(self, bazaar_products: dict) -> bool:
         """
@@ -462,10 +1317,12 @@ class Scraper:
             True if data validated successfully, False otherwise
         """
         if not bazaar_products:
+            metrics.increment("validation_failures_total", reason="empty")
             logger.error("No API response was given!")
             return False
         
         if not isinstance(bazaar_products, dict):
+            metrics.increment("validation_failures_total", reason="not_a_dict")
             logger.error("API response was not recognised!")
             return False
         
@@ -473,14 +1330,379 @@ class Scraper:
         missing_keys = [key for key in required_keys if key not in bazaar_products]
 
         if missing_keys:
+            metrics.increment("validation_failures_total", reason="missing_keys")
             logger.error(f"API response is missing required keys: {missing_keys}!")
             return False
         
         if bazaar_products["success"] != True:
+            metrics.increment("validation_failures_total", reason="unsuccessful")
             logger.error("API response was unsuccessful!")
             return False
         return True
 
-market = Market()
-while True:
-    market.scan_for_flips()
+class AuctionScraper:
+    """
+    Wrapper which sweeps every page of the Hypixel auction house API into a lowest-BIN index
+
+    Pages are fetched concurrently on a thread pool driven by asyncio. The pool starts a thread per
+    page in flight, up to MarketConfig.AUCTION_CONCURRENCY, which is sized above the auction house's
+    page count so every page after the first is requested in one round. Parsing and decoding each page
+    (about 9 ms per 1,000 auctions) holds the GIL, so a sweep takes two page latencies plus that CPU time
+    for every page, not just the slowest page. Every page is reduced to its
+    cheapest BIN listings as soon as it arrives, so the pages themselves are never held at once.
+    Has the same fetch_catalogue/last_updated interface as Scraper, so it can run on a RefreshScheduler.
+
+    Attributes:
+        url (str): The URL being fetched from
+        last_updated (int): Upstream "lastUpdated" of the last complete sweep, in milliseconds since epoch
+        lowest_bins (dict): Index of the last complete sweep, every key is a product_id, keys map to its LowestBin
+        session (Session): Persistent HTTP session shared by the page fetches, keeping up to AUCTION_CONCURRENCY connections
+        executor (ThreadPoolExecutor): Pool the page fetches run on, never more threads than the session has connections
+    """
+    ID_TAG = b"\x08\x00\x02id"#NBT string named "id", the Skyblock item id inside ExtraAttributes
+    COUNT_TAG = b"\x01\x00\x05Count"#NBT byte named "Count", the stack size
+
+    @dataclass
+    class LowestBin:
+        price: float#Per item
+        uuid: str
+        item_name: str
+
+    def __init__(self, url: str = None):
+        self.url = url or MarketConfig.AUCTION_URL
+        self.last_updated = 0
+        self.lowest_bins = {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MarketConfig.AUCTION_CONCURRENCY)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(make_headers(keep_alive=True, accept_encoding=True))
+        self.executor = ThreadPoolExecutor(max_workers=MarketConfig.AUCTION_CONCURRENCY, thread_name_prefix="AuctionScraper")
+
+    def fetch_catalogue(self) -> dict:
+        """
+        Sweep every auction page, skipping the sweep if upstream has not refreshed since the last one
+
+        Returns:
+            lowest_bins (dict): Every key is a product_id, keys map to its LowestBin. Empty if any page failed,
+                                as a partial sweep may be missing the real lowest BIN
+        """
+        with metrics.time_phase("auctions"):
+            return asyncio.run(self.fetch_all_pages())
+
+    async def fetch_all_pages(self) -> dict:
+        loop = asyncio.get_running_loop()
+        first_page = await loop.run_in_executor(self.executor, self.fetch_page, 0)
+        if first_page is None:
+            return {}
+        if first_page["lastUpdated"] == self.last_updated:#Auction house only refreshes once a minute
+            return self.lowest_bins
+
+        if first_page["totalPages"] - 1 > MarketConfig.AUCTION_CONCURRENCY:
+            logger.warning(f"{first_page['totalPages']} auction pages exceed AUCTION_CONCURRENCY, the sweep takes several rounds")
+        pages = await asyncio.gather(*(loop.run_in_executor(self.executor, self.fetch_page, page)
+                                       for page in range(1, first_page["totalPages"])))
+        if any(page is None for page in pages):
+            logger.error("Auction sweep is incomplete, discarding it!")
+            return {}
+
+        lowest_bins = first_page["lowest_bins"]
+        for page in pages:
+            if page["lastUpdated"] != first_page["lastUpdated"]:
+                logger.warning("Auction house refreshed during the sweep, pages are from different snapshots")
+            for product_id, lowest_bin in page["lowest_bins"].items():
+                if product_id not in lowest_bins or lowest_bin.price < lowest_bins[product_id].price:
+                    lowest_bins[product_id] = lowest_bin
+
+        logger.info(f"Swept {first_page['totalPages']} auction pages, {len(lowest_bins)} items listed as BIN")
+        self.last_updated = first_page["lastUpdated"]
+        self.lowest_bins = lowest_bins
+        return lowest_bins
+
+    def fetch_page(self, page: int) -> dict:
+        """
+        Fetch one page and reduce it to its cheapest BIN listing per item, runs on the executor
+
+        Returns:
+            page (dict): "lastUpdated", "totalPages" and "lowest_bins" of the page, None if it could not be fetched
+        """
+        for attempt in range(MarketConfig.MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(Scraper.calculate_retry_delay(attempt))
+            try:
+                response = self.session.get(self.url, params={"page": page}, timeout=MarketConfig.REQUEST_TIMEOUT)
+                if response.status_code in Scraper.RETRY_STATUSES:
+                    metrics.increment("api_errors_total", reason=f"auction_status_{response.status_code}")
+                    continue
+                response.raise_for_status()
+                auction_page = response.json()
+                if not isinstance(auction_page, dict) or auction_page.get("success") != True:
+                    metrics.increment("validation_failures_total", reason="auction_unsuccessful")
+                    logger.error(f"Auction page {page} was unsuccessful!")
+                    return None
+                return {
+                    "lastUpdated": auction_page["lastUpdated"],
+                    "totalPages": auction_page["totalPages"],
+                    "lowest_bins": self.index_lowest_bins(auction_page["auctions"])
+                    }
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.increment("api_errors_total", reason="auction_connection")
+                logger.warning(f"Fetching auction page {page} failed with {e}, attempt {attempt + 1}/{MarketConfig.MAX_RETRIES + 1}")
+
+            except Exception as e:
+                metrics.increment("api_errors_total", reason="auction_unknown")
+                logger.error(f"Unknown error {e} has occured while fetching auction page {page}!")
+                return None
+        return None
+
+    def index_lowest_bins(self, auctions: list) -> dict:
+        """
+        Arguments:
+            auctions (list[dict]): Auctions of one page
+
+        Returns:
+            lowest_bins (dict): Every key is a product_id, keys map to the cheapest BIN listing per item
+        """
+        lowest_bins = {}
+        for auction in auctions:
+            if not auction.get("bin") or auction.get("claimed"):
+                continue
+            product_id, count = self.decode_item(auction)
+            price = auction["starting_bid"] / count
+            if product_id not in lowest_bins or price < lowest_bins[product_id].price:
+                lowest_bins[product_id] = self.LowestBin(price, auction["uuid"], auction["item_name"])
+        return lowest_bins
+
+    def decode_item(self, auction: dict) -> tuple:
+        """
+        Read the Skyblock item id and stack size from the auction's gzipped NBT without a full NBT parser,
+        falling back to the item name for the id (e.g. "Enchanted Diamond" -> ENCHANTED_DIAMOND) and to a stack of one
+
+        Returns:
+            product_id (str): Bazaar style item id
+            count (int): Items in the listing
+        """
+        product_id = None
+        count = 1
+        try:
+            nbt = gzip.decompress(base64.b64decode(auction["item_bytes"]))
+            position = nbt.find(self.ID_TAG)
+            if position != -1:
+                start = position + len(self.ID_TAG) + 2
+                length = int.from_bytes(nbt[start - 2:start], "big")
+                product_id = nbt[start:start + length].decode()
+            position = nbt.find(self.COUNT_TAG)
+            if position != -1:
+                count = max(1, nbt[position + len(self.COUNT_TAG)])
+        except (KeyError, ValueError, OSError, EOFError, IndexError):
+            pass
+        if product_id is None:
+            product_id = self.name_to_product_id(auction["item_name"])
+        return product_id, count
+
+    @staticmethod
+    def name_to_product_id(item_name: str) -> str:
+        item_name = re.sub(r"\[Lvl \d+\]|§.|✪|[^A-Za-z0-9 ]", "", item_name)#Pet levels, colour codes, stars and symbols
+        return "_".join(item_name.upper().split())
+
+class RefreshScheduler:
+    """
+    Background fetcher which refreshes the catalogue shortly after upstream publishes a new snapshot
+
+    The upstream cadence is learnt from lastUpdated, the phase from which fetches found fresh data,
+    so the lag behind upstream shrinks towards MIN_POLL_INTERVAL instead of keeping the first fetch's lag.
+
+    Fetching runs on its own thread, every new snapshot is handed to consumers through
+    the snapshots queue and any registered callbacks, so consumers sleep until data arrives.
+
+    Attributes:
+        scraper (Scraper): The scraper used to fetch the bazaar, or an AuctionScraper
+        data_ttl (float): Seconds upstream data stays fresh, MarketConfig.DATA_TTL unless given
+        snapshots (Queue): Holds the newest catalogue not yet consumed, older ones are dropped
+        callbacks (list): Functions called from the fetcher thread with every new catalogue
+        failures (int): Number of consecutive failed fetches, used for backoff
+        cadence (float): Observed seconds between upstream lastUpdated changes, at most data_ttl
+        received_at (float): Local monotonic time the current lastUpdated was first received
+        lead (float): Seconds before received_at + cadence the next fetch is made, as the snapshot may have
+                      been waiting since before it was received
+        unchanged_polls (int): Fetches since then which returned the same lastUpdated, used for backoff
+    """
+    def __init__(self, scraper: "Scraper", data_ttl: float = None):
+        self.scraper = scraper
+        self.data_ttl = data_ttl or MarketConfig.DATA_TTL
+        self.snapshots = queue.Queue(maxsize=1)
+        self.callbacks = []
+        self.failures = 0
+        self.cadence = self.data_ttl
+        self.received_at = None
+        self.lead = 0.0
+        self.unchanged_polls = 0
+
+        self.__stop_event = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name="RefreshScheduler", daemon=True)
+
+    def subscribe(self, callback) -> None:
+        """
+        Arguments:
+            callback (Callable[[dict], None]): Called with every new catalogue
+        """
+        self.callbacks.append(callback)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        self.__thread.join()
+
+    def __run(self) -> None:
+        last_updated = None
+        while not self.__stop_event.is_set():
+            new_catalogue = self.scraper.fetch_catalogue()
+            if not new_catalogue:
+                self.failures += 1
+                delay = self.calculate_backoff()
+                logger.warning(f"Fetch failed {self.failures} time(s) in a row, retrying in {delay:.1f}s")
+            else:
+                self.failures = 0
+                if self.scraper.last_updated != last_updated:#Upstream may not have refreshed yet
+                    self.record_change(last_updated, self.scraper.last_updated)
+                    last_updated = self.scraper.last_updated
+                    self.__publish(new_catalogue)
+                else:
+                    self.unchanged_polls += 1
+                delay = self.calculate_next_refresh()
+            self.__stop_event.wait(delay)
+
+    def __publish(self, new_catalogue: dict) -> None:
+        try:
+            self.snapshots.put_nowait(new_catalogue)
+        except queue.Full:#Consumer is behind, only the newest snapshot matters
+            try:
+                self.snapshots.get_nowait()
+            except queue.Empty:
+                pass
+            self.snapshots.put_nowait(new_catalogue)
+
+        for callback in self.callbacks:
+            try:
+                callback(new_catalogue)
+            except Exception as e:
+                logger.error(f"Snapshot callback {callback} raised {e}!")
+
+    def record_change(self, previous_last_updated: int, last_updated: int) -> None:
+        """
+        Learn the upstream cadence from consecutive lastUpdated values, which share upstream's clock,
+        and the local time the change arrived, which shares ours, so the two clocks are never compared
+
+        A change found by the first fetch may have been waiting, so the lead doubles and the next fetch
+        comes earlier. A change found after unchanged fetches arrived within one poll interval of
+        being published, so the lead halves.
+        """
+        if previous_last_updated is not None and last_updated > previous_last_updated:
+            self.cadence = min((last_updated - previous_last_updated) / 1000, self.data_ttl)
+            if self.unchanged_polls:
+                self.lead /= 2
+            else:
+                self.lead = min(max(self.lead * 2, MarketConfig.MIN_POLL_INTERVAL), max(self.cadence - MarketConfig.MIN_POLL_INTERVAL, 0.0))
+        self.received_at = time.monotonic()
+        self.unchanged_polls = 0
+
+    def calculate_next_refresh(self) -> float:
+        """
+        The next snapshot is expected one cadence after the current one arrived, the fetch is made lead
+        seconds before that. Every fetch which finds the same lastUpdated doubles the wait from
+        MIN_POLL_INTERVAL up to data_ttl
+
+        Returns:
+            delay (float): Seconds until the next fetch
+        """
+        if self.unchanged_polls:
+            delay = MarketConfig.MIN_POLL_INTERVAL * 2 ** min(self.unchanged_polls - 1, 16)
+        else:
+            delay = self.received_at + self.cadence - self.lead - time.monotonic()
+        return min(max(delay, MarketConfig.MIN_POLL_INTERVAL), self.data_ttl)
+
+    def calculate_backoff(self) -> float:
+        """
+        Exponential backoff with full jitter, capped at MarketConfig.MAX_BACKOFF
+
+        Returns:
+            delay (float): Seconds until the next fetch
+        """
+        ceiling = min(MarketConfig.MAX_BACKOFF, self.data_ttl * 2 ** self.failures)
+        return max(MarketConfig.MIN_POLL_INTERVAL, random.uniform(0, ceiling))
+
+def run_scan(market: Market, args: argparse.Namespace) -> None:
+    if args.allocate:
+        market.print_allocation()
+    elif len(args.capital) > 1:
+        market.scan_capital_levels(args.capital)
+    else:
+        market.scan_for_flips()
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan the Hypixel bazaar for profitable flips")
+    parser.add_argument("--capital", type=float, nargs="+", default=[MarketConfig.DEFAULT_CAPITAL],
+                        help="Total coins at risk, several values compare the best flips at each")
+    parser.add_argument("--allocate", action="store_true",
+                        help="Split the capital across flips and print an order list instead of ranking flips")
+    parser.add_argument("--record", metavar="DIRECTORY",
+                        help="Append every fetched snapshot to a history store in this directory")
+    parser.add_argument("--cache", default=MarketConfig.CACHE_PATH,
+                        help="Warm-start cache file, shown until the first live refresh. Empty to disable")
+    parser.add_argument("--url", default=MarketConfig.API_URL,
+                        help="Bazaar endpoint to fetch, e.g. a local mock_server.py")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve pipeline metrics in the Prometheus text format on this port, see telemetry.py")
+    parser.add_argument("--metrics-file",
+                        help="Rewrite pipeline metrics in the Prometheus text format to this file after every scan")
+    parser.add_argument("--risk-adjusted", action="store_true",
+                        help="Rank flips by profit per hour adjusted for spread volatility and persistence")
+    parser.add_argument("--auctions", action="store_true",
+                        help="Also sweep the auction house and show cross-market flips against its lowest BINs")
+    parser.add_argument("--feed", metavar="TARGET",
+                        help="Stream the best flips as JSONL deltas to - (stdout, replaces the console output), a file or tcp:PORT")
+    args = parser.parse_args()
+
+    market = Market(args.capital[0], args.url, args.risk_adjusted)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    feed = open_feed(args.feed, MarketConfig.FEED_MIN_CHANGE) if args.feed else None
+    print_scans = args.feed != "-"#stdout carries the feed instead
+
+    scheduler = RefreshScheduler(market.scraper)
+    if args.record:
+        store = SnapshotStore(args.record)
+        scheduler.subscribe(lambda new_catalogue: store.append(market.scraper.last_updated / 1000, new_catalogue))
+    scheduler.start()#First live refresh runs while the cache is shown
+    if args.auctions:
+        auction_scheduler = RefreshScheduler(AuctionScraper(), MarketConfig.AUCTION_DATA_TTL)
+        auction_scheduler.subscribe(market.update_auctions)
+        auction_scheduler.start()
+
+    if args.cache and market.load_cache(args.cache):
+        if feed:
+            feed.publish(market.cached_flips or market.rank_flips(), market.timestamp.timestamp(), cached=True)
+        if print_scans and market.cached_flips and not args.allocate and len(args.capital) == 1:
+            market.print_flips(market.cached_flips)
+        elif print_scans:
+            print(f"=== CACHED FROM {market.timestamp:%Y-%m-%d %H:%M:%S} ===")
+            run_scan(market, args)
+
+    while True:
+        new_catalogue = scheduler.snapshots.get()#Blocks until the fetcher publishes
+        market.update_catalogue(new_catalogue)
+        if print_scans:
+            run_scan(market, args)
+        if feed:
+            feed.publish(market.rank_flips(), market.timestamp.timestamp())
+        if args.cache:
+            market.save_cache(args.cache)
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+
+if __name__ == "__main__":
+    main()
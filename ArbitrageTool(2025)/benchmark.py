@@ -0,0 +1,397 @@
+"""
+Benchmarks the bazaar pipeline on synthetic or recorded payloads, reporting JSON so runs can be compared across commits.
+
+Per-function latency covers refinement and scoring at several book depths, end-to-end latency, allocations
+and peak memory cover catalogue updates, scans, feed publishing and capital allocation at multiples of the real catalogue size
+(about 1,500 products), with a share of the products repriced between refreshes (see reprice_payload).
+Memory is measured in a separate pass, as tracemalloc slows everything it traces.
+
+Run: python benchmark.py --scales 1 10 100 --depths 5 30 --output benchmark.json
+Recorded payload: python benchmark.py --payload bazaar_fixture.json (see mock_server.py --write-fixture)
+Legacy comparison: python benchmark.py --legacy
+
+Every suite run first asserts that the pruned incremental ranking matches a brute-force ranking (see verify_pruning).
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+
+from bazaar import Item, Market, MarketConfig, Scraper, Summary
+from feed import FlipFeed
+from mock_server import generate_catalogue
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Bundle:
+    amount: int
+    total_valuation: float
+    orders: int
+
+def legacy_percentage_difference(val1: float, val2: float) -> float:
+    try:
+        return abs((val1 - val2) / abs((val1 + val2) / 2)) * 100
+    except ZeroDivisionError:
+        return float("inf")
+
+def legacy_remove_suspicious_orders(summary: list) -> list:
+    """Original implementation, recurses on summary[1:] so each level copies the rest of the book"""
+    if len(summary) <= 1:
+        return summary
+    order1 = summary[0]
+    order2 = summary[1]
+    if (legacy_percentage_difference(order1["pricePerUnit"], order2["pricePerUnit"]) > MarketConfig.MANIPULATED_PRICE_THRESHOLD
+            and legacy_percentage_difference(order1["amount"], order2["amount"]) > MarketConfig.MANIPULATED_ORDER_THRESHOLD):
+        return legacy_remove_suspicious_orders(summary[1:])
+    return summary
+
+def legacy_group_similar_orders(summary: list) -> list:
+    """Original implementation, allocates a Bundle per price band"""
+    if len(summary) <= 1:
+        return summary
+    final_summary = []
+    new_bundle = Bundle(0, 0, 0)
+    target_price = summary[0]["pricePerUnit"]
+    for listing in summary:
+        amount = listing["amount"]
+        price = listing["pricePerUnit"]
+        orders = listing["orders"]
+        if legacy_percentage_difference(target_price, price) < MarketConfig.SAME_ORDER_THRESHOLD:
+            new_bundle.amount += amount
+            new_bundle.total_valuation += (price * amount)
+            new_bundle.orders += orders
+        else:
+            final_summary.append({"amount": new_bundle.amount, "pricePerUnit": new_bundle.total_valuation / new_bundle.amount, "order": new_bundle.orders})
+            new_bundle = Bundle(amount, price * amount, orders)
+    final_summary.append({"amount": new_bundle.amount, "pricePerUnit": new_bundle.total_valuation / new_bundle.amount, "order": new_bundle.orders})
+    return final_summary
+
+def generate_book(depth: int, manipulated: int, rng: random.Random) -> list:
+    """
+    Arguments:
+        depth (int): Number of listings in the book
+        manipulated (int): Number of suspicious listings stacked on top of the book
+
+    Returns:
+        summary (list): A synthetic Buy/Sell Summary
+    """
+    summary = []
+    for i in range(manipulated):#Alternate cheap single items with expensive bulk listings
+        if i % 2:
+            summary.append({"amount": 10000, "pricePerUnit": 1000.0, "orders": 40})
+        else:
+            summary.append({"amount": 1, "pricePerUnit": 100.0, "orders": 1})
+    price = 500.0
+    for _ in range(depth - manipulated):
+        price += rng.choice((0.1, 0.1, 0.2, 10.0))
+        summary.append({"amount": rng.randint(1, 5000), "pricePerUnit": round(price, 1), "orders": rng.randint(1, 30)})
+    return summary
+
+def load_summary(listings: list) -> Summary:
+    summary = Summary()
+    summary.load(listings)
+    return summary
+
+def as_levels(listings: list) -> list:
+    """Listings as (price, amount, orders) tuples, legacy grouping names the orders key 'order'"""
+    return [(listing["pricePerUnit"], listing["amount"], listing.get("orders", listing.get("order"))) for listing in listings]
+
+def time_call(function, prepare, repeats: int) -> float:
+    """
+    Arguments:
+        function (Callable): Called with the output of prepare, only the call is timed
+        prepare (Callable): Builds a fresh input for every call, as refinement works in place
+
+    Returns:
+        best (float): Fastest of the repeated calls, in microseconds
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        argument = prepare()
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+def benchmark_refinement(depths: list, repeats: int = 20) -> None:
+    rng = random.Random(0)
+    quick_status = {key: 0 for key in ("sellPrice", "sellVolume", "sellMovingWeek", "sellOrders", "buyPrice", "buyVolume", "buyMovingWeek", "buyOrders")}
+    item = Item("BENCHMARK", {"sell_summary": [], "buy_summary": [], "quick_status": quick_status})
+    threshold = MarketConfig.MANIPULATED_ORDER_THRESHOLD
+    MarketConfig.MANIPULATED_ORDER_THRESHOLD = 150#Default of 200 can never trigger with positive amounts
+    try:
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 2 * max(depths) + 100))
+
+        print(f"{'depth':>7}{'function':>28}{'legacy (us)':>14}{'linear (us)':>14}{'speedup':>10}")
+        for depth in depths:
+            listings = generate_book(depth, depth // 2, rng)
+            cases = [
+                ("remove_suspicious_orders", legacy_remove_suspicious_orders, item.remove_suspicious_orders),
+                ("group_similar_orders", legacy_group_similar_orders, item.group_similar_orders),
+            ]
+            for name, legacy, linear in cases:
+                summary = load_summary(listings)
+                linear(summary)
+                assert as_levels(legacy(listings)) == as_levels(summary.listings()), f"{name} output differs at depth {depth}"
+                legacy_time = time_call(legacy, lambda: listings, repeats)
+                linear_time = time_call(linear, lambda: load_summary(listings), repeats)
+                print(f"{depth:>7}{name:>28}{legacy_time:>14.1f}{linear_time:>14.1f}{legacy_time / linear_time:>9.1f}x")
+    finally:
+        MarketConfig.MANIPULATED_ORDER_THRESHOLD = threshold
+
+CATALOGUE_SIZE = 1500#Products on the real bazaar
+CHANGE_FRACTION = 0.3#Share of products whose book changes between two refreshes
+CAPITAL = 1e8
+
+def load_payload(path: str = None, depth: int = 30, seed: int = 0) -> dict:
+    """
+    Arguments:
+        path (str): Recorded API response or fixture, synthetic products if not given
+        depth (int): Max listings per summary of synthetic products
+
+    Returns:
+        products (dict): Products compacted as Scraper.parse_response does
+    """
+    if path:
+        with open(path) as file:
+            products = json.load(file)["products"]
+    else:
+        products = generate_catalogue(CATALOGUE_SIZE, depth, seed)
+    return {product_id: Scraper.compact_product(product_data) for product_id, product_data in products.items()}
+
+def scale_payload(products: dict, scale: int) -> dict:
+    """Repeat the products under new ids, sharing their data so large catalogues stay cheap to build"""
+    if scale == 1:
+        return dict(products)
+    return {f"{product_id}_{copy}": product_data for copy in range(scale) for product_id, product_data in products.items()}
+
+def reprice_payload(products: dict, rng: random.Random) -> dict:
+    """Move the quick status of CHANGE_FRACTION of the products around their top of the book, so flips enter and leave the top"""
+    changed = dict(products)
+    for product_id in rng.sample(list(products), int(len(products) * CHANGE_FRACTION)):
+        product_data = products[product_id]
+        quick_status = dict(product_data["quick_status"])
+        if product_data["buy_summary"]:
+            quick_status["buyPrice"] = product_data["buy_summary"][0]["pricePerUnit"] * rng.uniform(0.9, 1.2)
+        quick_status["buyMovingWeek"] = int(10 ** rng.uniform(0, 7))
+        quick_status["sellMovingWeek"] = int(10 ** rng.uniform(0, 7))
+        changed[product_id] = {**product_data, "quick_status": quick_status}
+    return changed
+
+def summarise_times(times: list) -> dict:
+    """
+    Arguments:
+        times (list[float]): Seconds taken by every call
+
+    Returns:
+        summary (dict): Calls and mean, median and 95th percentile latency in microseconds
+    """
+    times = sorted(times)
+    return {
+        "calls": len(times),
+        "mean_us": statistics.fmean(times) * 1e6,
+        "p50_us": times[len(times) // 2] * 1e6,
+        "p95_us": times[min(len(times) - 1, int(len(times) * 0.95))] * 1e6
+        }
+
+def measure_memory(function) -> dict:
+    """
+    Returns:
+        memory (dict): Bytes still allocated after the call and peak bytes allocated during it
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"allocated_bytes": current - baseline, "peak_bytes": peak - baseline}
+
+def benchmark_functions(products: dict, depth: int, sample: int, rng: random.Random) -> list:
+    """
+    Time refinement and scoring per product on a sample of the payload
+
+    Returns:
+        results (list[dict]): One entry per function
+    """
+    product_ids = rng.sample(list(products), min(sample, len(products)))
+    items = [Item(product_id, products[product_id]) for product_id in product_ids]
+
+    def reload(item, product_id):
+        item.sell_summary.load(products[product_id]["sell_summary"])
+        item.buy_summary.load(products[product_id]["buy_summary"])
+
+    cases = {
+        "remove_suspicious_orders": (reload, lambda item: item.remove_suspicious_orders(item.buy_summary)),
+        "group_similar_orders": (reload, lambda item: item.group_similar_orders(item.buy_summary)),
+        "refine_item": (reload, lambda item: item.refine_item()),
+        "update_item": (lambda item, product_id: setattr(item, "fingerprint", None),
+                        lambda item: item.update_item(products[item.product_id])),
+        "calculate_max_buy_volume": (None, lambda item: item.calculate_max_buy_volume(CAPITAL)),
+        "calculate_profit_per_hour": (None, lambda item: item.calculate_profit_per_hour(CAPITAL)),
+    }
+
+    results = []
+    for name, (prepare, function) in cases.items():
+        times = []
+        for item, product_id in zip(items, product_ids):
+            if prepare:
+                prepare(item, product_id)
+            start = time.perf_counter()
+            function(item)
+            times.append(time.perf_counter() - start)
+
+        def run_all():
+            for item, product_id in zip(items, product_ids):
+                if prepare:
+                    prepare(item, product_id)
+                function(item)
+        results.append({"function": name, "depth": depth, **summarise_times(times), **measure_memory(run_all)})
+    return results
+
+def run_pipeline(products: dict, rng: random.Random, timed: bool) -> list:
+    """
+    Run a cold update and scan, an unchanged refresh, then a repriced refresh and scan,
+    publishing every scan to the feed and allocating capital across the final ranking.
+    The incremental scan runs against a ranking of real flips, so it shows the pruned steady state.
+
+    Arguments:
+        timed (bool): Time every phase, otherwise measure its memory
+
+    Returns:
+        phases (list[tuple]): (phase, result) pairs, seconds if timed, otherwise see measure_memory
+    """
+    changed_products = reprice_payload(products, rng)
+    market = Market(CAPITAL)
+    feed = FlipFeed(MarketConfig.FEED_MIN_CHANGE)
+    output = io.StringIO()
+    feed.add_stream(output)
+    def scan():
+        with redirect_stdout(output):
+            market.scan_for_flips()
+    def publish():
+        feed.publish(market.rank_flips(), market.timestamp.timestamp())
+
+    phases = [
+        ("update_cold", lambda: market.update_catalogue(products)),
+        ("scan_cold", scan),
+        ("publish_cold", publish),
+        ("update_unchanged", lambda: market.update_catalogue(products)),
+        ("update_changed", lambda: market.update_catalogue(changed_products)),
+        ("scan_incremental", scan),
+        ("publish_incremental", publish),
+        ("allocate", market.allocate_capital),
+    ]
+    results = []
+    for phase, function in phases:
+        if timed:
+            start = time.perf_counter()
+            function()
+            results.append((phase, time.perf_counter() - start))
+        else:
+            results.append((phase, measure_memory(function)))
+    return results
+
+def benchmark_pipeline(products: dict, scale: int, depth: int, seed: int) -> list:
+    """
+    Returns:
+        results (list[dict]): Latency, allocations and peak memory of every pipeline phase
+    """
+    scaled = scale_payload(products, scale)
+    timings = run_pipeline(scaled, random.Random(seed), timed=True)
+    memory = run_pipeline(scaled, random.Random(seed), timed=False)
+    return [{"scale": scale, "products": len(scaled), "depth": depth, "phase": phase, "seconds": seconds, **usage}
+            for (phase, seconds), (_, usage) in zip(timings, memory)]
+
+def verify_pruning(products: dict, rounds: int = 15, seed: int = 0) -> None:
+    """
+    Assert that the top flips of the pruned incremental ranking (see Market.rescore_changed_products)
+    equal a brute-force ranking of every product, in both ranking modes and across a capital change
+    """
+    for risk_adjusted in (False, True):
+        rng = random.Random(seed)
+        market = Market(CAPITAL, risk_adjusted=risk_adjusted)
+        current = products
+        for round_number in range(rounds):
+            if round_number == rounds // 2:
+                market.set_capital(CAPITAL / 100)
+            current = reprice_payload(current, rng)
+            market.update_catalogue(current)
+            ranked = [flip.risk_adjusted_profit if risk_adjusted else flip.profit_per_hour for flip in market.rank_flips()]
+
+            brute_force = []
+            for item in market.catalogue.values():
+                if not item.is_tradeable():
+                    continue
+                profit_per_hour = item.calculate_profit_per_hour(market.capital)
+                brute_force.append(item.calculate_risk_adjusted_profit(market.capital, profit_per_hour) if risk_adjusted else profit_per_hour)
+            brute_force = sorted(brute_force, reverse=True)[:MarketConfig.MAX_FLIPS_SHOWN]
+            assert ranked == brute_force, f"Pruned ranking differs from brute force in round {round_number} (risk_adjusted={risk_adjusted})"
+
+def describe_run() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not resolve the commit being benchmarked: {e}")
+        commit = "unknown"
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(), "timestamp": time.time()}
+
+def run_suite(scales: list, depths: list, payload: str = None, sample: int = 500, seed: int = 0) -> dict:
+    """
+    Importable entry point of the benchmark suite
+
+    Arguments:
+        scales (list[int]): Multiples of the catalogue size to run the pipeline at
+        depths (list[int]): Max book depths of synthetic payloads, ignored with a recorded payload
+        payload (str): Recorded API response or fixture to use instead of synthetic products
+        sample (int): Products timed per function
+
+    Returns:
+        results (dict): "run" metadata, "functions" and "pipeline" results
+    """
+    results = {"run": {**describe_run(), "payload": payload or "synthetic"}, "functions": [], "pipeline": []}
+    for depth in ([None] if payload else depths):
+        products = load_payload(payload, depth, seed)
+        verify_pruning(products, seed=seed)
+        results["functions"].extend(benchmark_functions(products, depth, sample, random.Random(seed)))
+        for scale in scales:
+            results["pipeline"].extend(benchmark_pipeline(products, scale, depth, seed))
+    return results
+
+def main():
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="Benchmark the bazaar refine and scan pipeline")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Multiples of the catalogue size")
+    parser.add_argument("--depths", type=int, nargs="+", default=[5, 30], help="Max book depths of synthetic payloads")
+    parser.add_argument("--payload", help="Recorded API response or fixture to use instead of synthetic products")
+    parser.add_argument("--sample", type=int, default=500, help="Products timed per function")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--legacy", action="store_true", help="Compare the refinement against the original recursive implementation instead")
+    args = parser.parse_args()
+
+    if args.legacy:
+        benchmark_refinement([30, 300, 3000])
+        return
+
+    results = json.dumps(run_suite(args.scales, args.depths, args.payload, args.sample), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(results)
+    else:
+        print(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Machine-readable JSONL feed of the best flips.
+
+Every consumer first receives a full snapshot of the current top flips, then only deltas:
+    {"type": "snapshot", "timestamp": ..., "cached": false, "flips": [{"product_id": ..., "profit_per_hour": ..., "imbalance": ..., "rank": 0}, ...]}
+    {"type": "enter", "timestamp": ..., "product_id": ..., "profit_per_hour": ..., "imbalance": ..., "rank": 3}
+    {"type": "update", "timestamp": ..., "product_id": ..., "profit_per_hour": ..., "imbalance": ..., "rank": 1}
+    {"type": "leave", "timestamp": ..., "product_id": ...}
+
+An update is only sent when profit per hour moves by more than min_change percent or the imbalance flips,
+rank changes alone are not sent. Consumers read the stream from stdout, a file, or a local TCP socket.
+"""
+
+import sys
+import json
+import socket
+import logging
+import threading
+import socketserver
+
+logger = logging.getLogger(__name__)
+
+class FlipFeed:
+    """
+    Diffs each ranking against the last one published and writes the changes to every consumer
+
+    Attributes:
+        min_change (float): Percent change in profit per hour below which a flip is not updated
+        published (dict): Every key is a product_id, keys map to the flip as last sent
+        ranks (list): product_ids of the published flips, best first
+        timestamp (float): Seconds since epoch of the data last published
+        cached (bool): True while the published flips come from the warm-start cache
+        streams (list): Open text streams which receive every message
+    """
+    def __init__(self, min_change: float = 1.0):
+        self.min_change = min_change
+        self.published = {}
+        self.ranks = []
+        self.timestamp = 0.0
+        self.cached = False
+        self.streams = []
+
+        self.__lock = threading.Lock()
+
+    def add_stream(self, stream) -> None:
+        """
+        Send the current snapshot to stream, then every delta after it.
+        Before the first publish there is nothing to snapshot, the stream then starts with the first publish's snapshot
+
+        Arguments:
+            stream (TextIO): Any writable text stream, e.g. sys.stdout or an open file
+        """
+        with self.__lock:
+            if not self.timestamp or self.__write(stream, [self.snapshot_message()]):
+                self.streams.append(stream)
+
+    def publish(self, best_flips: list, timestamp: float, cached: bool = False) -> None:
+        """
+        Arguments:
+            best_flips (list[Flip]): The current top flips, best first (see Market.rank_flips)
+            timestamp (float): Seconds since epoch of the data the flips were ranked from
+            cached (bool): True if the flips come from the warm-start cache
+        """
+        with self.__lock:
+            first_publish = not self.timestamp
+            self.timestamp = timestamp
+            messages = []
+            if first_publish or cached != self.cached:#First snapshot, or consumers must not mistake cached flips for live ones, resend everything
+                self.cached = cached
+                self.__replace(best_flips)
+                messages.append(self.snapshot_message())
+            else:
+                messages.extend(self.__diff(best_flips))
+
+            if messages:
+                self.streams = [stream for stream in self.streams if self.__write(stream, messages)]
+
+    def snapshot_message(self) -> dict:
+        return {"type": "snapshot", "timestamp": self.timestamp, "cached": self.cached,
+                "flips": [{**self.published[product_id], "rank": rank} for rank, product_id in enumerate(self.ranks)]}
+
+    def __diff(self, best_flips: list) -> list:
+        messages = []
+        ranks = [flip.product_id for flip in best_flips]
+        for product_id in set(self.published) - set(ranks):
+            messages.append({"type": "leave", "timestamp": self.timestamp, "product_id": product_id})
+            del self.published[product_id]
+
+        for rank, flip in enumerate(best_flips):
+            previous = self.published.get(flip.product_id)
+            if previous is None:
+                kind = "enter"
+            elif self.is_material_change(previous, flip):
+                kind = "update"
+            else:
+                continue
+            self.published[flip.product_id] = self.describe(flip)
+            messages.append({"type": kind, "timestamp": self.timestamp, **self.published[flip.product_id], "rank": rank})
+        self.ranks = ranks
+        return messages
+
+    def __replace(self, best_flips: list) -> None:
+        self.published = {flip.product_id: self.describe(flip) for flip in best_flips}
+        self.ranks = [flip.product_id for flip in best_flips]
+
+    def is_material_change(self, previous: dict, flip) -> bool:
+        if previous["imbalance"] != flip.imbalance:
+            return True
+        old_profit = previous["profit_per_hour"]
+        if old_profit == 0:
+            return flip.profit_per_hour != 0
+        return abs(flip.profit_per_hour - old_profit) / abs(old_profit) * 100 > self.min_change
+
+    @staticmethod
+    def describe(flip) -> dict:
+        return {"product_id": flip.product_id, "profit_per_hour": flip.profit_per_hour, "imbalance": flip.imbalance}
+
+    @staticmethod
+    def __write(stream, messages: list) -> bool:
+        """
+        Returns:
+            bool: False if the consumer went away and should be dropped
+        """
+        try:
+            stream.write("".join(json.dumps(message) + "\n" for message in messages))
+            stream.flush()
+            return True
+        except (OSError, ValueError) as e:#ValueError is raised on closed files
+            logger.info(f"Dropping feed consumer {stream}: {e}")
+            return False
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> socketserver.ThreadingTCPServer:
+        """
+        Accept consumers on a local TCP socket, each connection receives a snapshot and then the deltas
+
+        Returns:
+            server (ThreadingTCPServer): Call shutdown() to stop it
+        """
+        feed = self
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.settimeout(5)#A stalled consumer is dropped instead of blocking the feed
+                stream = self.request.makefile("w", encoding="utf-8")
+                feed.add_stream(stream)
+                while stream in feed.streams:#Hold the connection open until either side drops it
+                    try:
+                        if not self.request.recv(1024):
+                            break
+                    except socket.timeout:
+                        continue
+                    except OSError:
+                        break
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        server = Server((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="FlipFeed", daemon=True).start()
+        logger.info(f"Serving flip feed on {host}:{server.server_address[1]}")
+        return server
+
+def open_feed(target: str, min_change: float = 1.0) -> FlipFeed:
+    """
+    Arguments:
+        target (str): "-" for stdout, "tcp:PORT" for a local socket, otherwise a file appended to
+
+    Returns:
+        feed (FlipFeed): Feed writing to the target
+    """
+    feed = FlipFeed(min_change)
+    if target == "-":
+        feed.add_stream(sys.stdout)
+    elif target.startswith("tcp:"):
+        feed.serve(int(target[4:]))
+    else:
+        feed.add_stream(open(target, "a", encoding="utf-8"))
+    return feed
@@ -0,0 +1,339 @@
+"""
+Append-only time-series store for bazaar snapshots.
+
+Every snapshot stores, per product, the quick status and the top BOOK_DEPTH listings of
+each summary as fixed-width float64 records. Snapshots are grouped into chunks:
+the open chunk is an uncompressed row-major log, full chunks are sealed into one
+zlib-compressed, column-major block per product so a product's history can be read
+without touching the rest of the catalogue.
+
+Directory layout:
+    products.txt      product_ids, the line number is the product's column
+    times.idx         float64 timestamp of every snapshot
+    chunks.idx        uint64 (first snapshot, number of products) of every chunk
+    chunk_XXXXXX.log  open chunk
+    chunk_XXXXXX.z    sealed chunk
+"""
+
+import os
+import mmap
+import zlib
+import struct
+import bisect
+import logging
+from array import array
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+QUICK_STATUS_FIELDS = ("sellPrice", "sellVolume", "sellMovingWeek", "sellOrders",
+                       "buyPrice", "buyVolume", "buyMovingWeek", "buyOrders")
+LISTING_FIELDS = ("amount", "pricePerUnit", "orders")
+BOOK_DEPTH = 5
+SUMMARY_FIELDS = tuple(f"{summary}_{level}_{key}"
+                       for summary in ("sell_summary", "buy_summary")
+                       for level in range(BOOK_DEPTH)
+                       for key in LISTING_FIELDS)
+FIELDS = QUICK_STATUS_FIELDS + SUMMARY_FIELDS
+CHUNK_ROWS = 120#30 minutes of 15 second snapshots
+CHUNK_MAGIC = b"BZCH"
+CHUNK_HEADER = struct.Struct("<4sII")#magic, rows, number of products
+MISSING = float("nan")
+
+@dataclass
+class History:
+    timestamps: array
+    columns: dict#Every key is a field name (see FIELDS), keys map to an array of values, NaN where missing
+
+class SnapshotStore:
+    """
+    Append-only, chunked and compressed store of bazaar snapshots.
+
+    Attributes:
+        directory (str): Where the store's files live
+        product_ids (list): Every product ever recorded, in column order
+        product_index (dict): Every key is a product_id, keys map to its column
+        chunks (array): Flattened (first snapshot, number of products) pairs of every chunk
+        snapshot_count (int): Number of snapshots recorded
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.product_ids = []
+        products_path = self.__path("products.txt")
+        if os.path.exists(products_path):
+            with open(products_path) as file:
+                self.product_ids = file.read().split()
+        self.product_index = {product_id: index for index, product_id in enumerate(self.product_ids)}
+
+        self.chunks = self.__load_array("chunks.idx", "Q")
+        self.snapshot_count = os.path.getsize(self.__path("times.idx")) // 8 if os.path.exists(self.__path("times.idx")) else 0
+        if os.path.exists(self.__path("times.idx")) and os.path.getsize(self.__path("times.idx")) != self.snapshot_count * 8:
+            os.truncate(self.__path("times.idx"), self.snapshot_count * 8)#Interrupted mid-write, drop the partial timestamp
+        self.__last_timestamp = self.__load_array("times.idx", "d")[-1] if self.snapshot_count else float("-inf")
+
+        chunk = len(self.chunks) // 2 - 1
+        if chunk >= 0 and os.path.exists(self.__chunk_path(chunk, "z")) and os.path.exists(self.__chunk_path(chunk, "log")):
+            os.remove(self.__chunk_path(chunk, "log"))#Interrupted while sealing, the sealed copy is complete
+        elif chunk >= 0 and os.path.exists(self.__chunk_path(chunk, "log")):
+            logged_size = (self.snapshot_count - self.chunks[2 * chunk]) * self.chunks[2 * chunk + 1] * len(FIELDS) * 8
+            if os.path.getsize(self.__chunk_path(chunk, "log")) > logged_size:
+                os.truncate(self.__chunk_path(chunk, "log"), logged_size)#Interrupted before the row's timestamp was written, drop the orphan row
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def __chunk_path(self, chunk: int, extension: str) -> str:
+        return self.__path(f"chunk_{chunk:06d}.{extension}")
+
+    def __load_array(self, name: str, typecode: str) -> array:
+        values = array(typecode)
+        if os.path.exists(self.__path(name)):
+            with open(self.__path(name), "rb") as file:
+                values.frombytes(file.read())
+        return values
+
+    def __append_bytes(self, name: str, data: bytes) -> None:
+        with open(self.__path(name), "ab") as file:
+            file.write(data)
+
+    #Writing
+    def append(self, timestamp: float, products: dict) -> None:
+        """
+        Record a snapshot
+
+        Arguments:
+            timestamp (float): Seconds since epoch the snapshot was taken upstream, must increase
+            products (dict): Products fetched from the API, see Scraper.fetch_catalogue
+        """
+        if timestamp <= self.__last_timestamp:
+            raise ValueError(f"Snapshot at {timestamp} is not newer than the last one at {self.__last_timestamp}!")
+
+        new_products = [product_id for product_id in products if product_id not in self.product_index]
+        if new_products:
+            for product_id in new_products:
+                self.product_index[product_id] = len(self.product_ids)
+                self.product_ids.append(product_id)
+            self.__append_bytes("products.txt", "".join(f"{product_id}\n" for product_id in new_products).encode())
+
+        chunk = len(self.chunks) // 2 - 1
+        sealed = chunk < 0 or os.path.exists(self.__chunk_path(chunk, "z"))
+        if sealed or self.chunks[2 * chunk + 1] != len(self.product_ids):#Rows are fixed width, new products need a new chunk
+            if not sealed:
+                self.seal_chunk(chunk)
+            chunk += 1
+            opened = array("Q", [self.snapshot_count, len(self.product_ids)])
+            self.chunks.extend(opened)
+            self.__append_bytes("chunks.idx", opened.tobytes())
+
+        row = array("d", [MISSING] * (len(self.product_ids) * len(FIELDS)))
+        for product_id, product_data in products.items():
+            offset = self.product_index[product_id] * len(FIELDS)
+            row[offset:offset + len(FIELDS)] = self.encode_product(product_data)
+        with open(self.__chunk_path(chunk, "log"), "ab") as file:
+            file.write(row.tobytes())
+
+        self.__append_bytes("times.idx", struct.pack("<d", timestamp))
+        self.snapshot_count += 1
+        self.__last_timestamp = timestamp
+
+        if self.snapshot_count - self.chunks[2 * chunk] >= CHUNK_ROWS:
+            self.seal_chunk(chunk)
+
+    @staticmethod
+    def encode_product(product_data: dict) -> array:
+        """
+        Returns:
+            record (array): The product's values in FIELDS order, NaN for missing listings
+        """
+        quick_status = product_data["quick_status"]
+        record = array("d", [quick_status.get(key, MISSING) for key in QUICK_STATUS_FIELDS])
+        for summary in ("sell_summary", "buy_summary"):
+            listings = product_data[summary][:BOOK_DEPTH]
+            for listing in listings:
+                record.extend(listing.get(key, MISSING) for key in LISTING_FIELDS)
+            record.extend([MISSING] * (len(LISTING_FIELDS) * (BOOK_DEPTH - len(listings))))
+        return record
+
+    def seal_chunk(self, chunk: int) -> None:
+        """
+        Compress the open chunk into one column-major block per product, then drop the log
+        """
+        log_path = self.__chunk_path(chunk, "log")
+        product_count = self.chunks[2 * chunk + 1]
+        stride = product_count * len(FIELDS)
+        rows = array("d")
+        with open(log_path, "rb") as file:
+            rows.frombytes(file.read())
+        row_count = len(rows) // stride if stride else 0
+
+        blocks = []
+        for product in range(product_count):
+            columns = array("d")
+            for field in range(len(FIELDS)):
+                columns.extend(rows[product * len(FIELDS) + field::stride])
+            blocks.append(zlib.compress(columns.tobytes()))
+
+        offsets = array("Q")
+        position = CHUNK_HEADER.size + 16 * product_count
+        for block in blocks:
+            offsets.extend((position, len(block)))
+            position += len(block)
+
+        temporary_path = self.__chunk_path(chunk, "tmp")
+        with open(temporary_path, "wb") as file:
+            file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, row_count, product_count))
+            file.write(offsets.tobytes())
+            for block in blocks:
+                file.write(block)
+        os.replace(temporary_path, self.__chunk_path(chunk, "z"))
+        os.remove(log_path)
+        logger.info(f"Sealed chunk {chunk} with {row_count} snapshots of {product_count} products")
+
+    #Reading
+    def read(self, product_id: str, start: float, end: float, fields: tuple = FIELDS) -> History:
+        """
+        Read a product's history between two timestamps, inclusive
+
+        Arguments:
+            product_id (str): The product to read
+            start (float): Seconds since epoch
+            end (float): Seconds since epoch
+            fields (tuple): Names of the fields to read, see FIELDS
+
+        Returns:
+            history (History): Timestamps and the requested columns
+        """
+        field_positions = [FIELDS.index(field) for field in fields]
+        history = History(array("d"), {field: array("d") for field in fields})
+        product = self.product_index.get(product_id)
+        if product is None or not self.snapshot_count:
+            return history
+
+        with open(self.__path("times.idx"), "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            times = memoryview(mapped).cast("d")
+            first = bisect.bisect_left(times, start, 0, self.snapshot_count)
+            last = bisect.bisect_right(times, end, first, self.snapshot_count)
+            history.timestamps.extend(times[first:last])
+            times.release()
+
+        chunk_starts = self.chunks[0::2]
+        chunk = max(bisect.bisect_right(chunk_starts, first) - 1, 0)
+        while first < last:
+            chunk_start = chunk_starts[chunk]
+            chunk_end = chunk_starts[chunk + 1] if chunk + 1 < len(chunk_starts) else self.snapshot_count
+            rows = range(first - chunk_start, min(last, chunk_end) - chunk_start)
+            values = self.__read_chunk(chunk, product, field_positions, rows)
+            for field, column in zip(fields, values):
+                history.columns[field].extend(column)
+            first = min(last, chunk_end)
+            chunk += 1
+        return history
+
+    def find_snapshot(self, timestamp: float) -> int:
+        """
+        Returns:
+            index (int): The first snapshot taken at or after the timestamp, snapshot_count if there is none
+        """
+        if not self.snapshot_count:
+            return 0
+        with open(self.__path("times.idx"), "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            times = memoryview(mapped).cast("d")
+            index = bisect.bisect_left(times, timestamp, 0, self.snapshot_count)
+            times.release()
+        return index
+
+    def read_snapshot(self, index: int) -> tuple:
+        """
+        Rebuild a whole snapshot in the API's format, summaries only hold the top BOOK_DEPTH listings
+
+        Arguments:
+            index (int): The snapshot's position, see find_snapshot
+
+        Returns:
+            timestamp (float): Seconds since epoch
+            products (dict): Every key is a product_id, keys map to the product's data
+        """
+        with open(self.__path("times.idx"), "rb") as file:
+            file.seek(8 * index)
+            timestamp, = struct.unpack("<d", file.read(8))
+
+        chunk_starts = self.chunks[0::2]
+        chunk = bisect.bisect_right(chunk_starts, index) - 1
+        row = index - chunk_starts[chunk]
+        product_count = self.chunks[2 * chunk + 1]
+
+        products = {}
+        sealed_path = self.__chunk_path(chunk, "z")
+        if os.path.exists(sealed_path):
+            with open(sealed_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                _, row_count, _ = CHUNK_HEADER.unpack_from(mapped, 0)
+                for product in range(product_count):
+                    offset, length = struct.unpack_from("<QQ", mapped, CHUNK_HEADER.size + 16 * product)
+                    block = array("d")
+                    block.frombytes(zlib.decompress(mapped[offset:offset + length]))
+                    product_data = self.decode_product(block[row::row_count])
+                    if product_data:
+                        products[self.product_ids[product]] = product_data
+        else:
+            stride = product_count * len(FIELDS)
+            with open(self.__chunk_path(chunk, "log"), "rb") as file:
+                file.seek(8 * stride * row)
+                values = array("d")
+                values.frombytes(file.read(8 * stride))
+            for product in range(product_count):
+                product_data = self.decode_product(values[product * len(FIELDS):(product + 1) * len(FIELDS)])
+                if product_data:
+                    products[self.product_ids[product]] = product_data
+        return timestamp, products
+
+    @staticmethod
+    def decode_product(record: array) -> dict:
+        """
+        Inverse of encode_product
+
+        Returns:
+            product_data (dict): The product in the API's format, None if it was missing from the snapshot
+        """
+        if record[0] != record[0]:#NaN, product was not listed
+            return None
+        product_data = {"quick_status": dict(zip(QUICK_STATUS_FIELDS, record[:len(QUICK_STATUS_FIELDS)]))}
+        position = len(QUICK_STATUS_FIELDS)
+        for summary in ("sell_summary", "buy_summary"):
+            listings = []
+            for _ in range(BOOK_DEPTH):
+                amount, price, orders = record[position:position + len(LISTING_FIELDS)]
+                position += len(LISTING_FIELDS)
+                if price == price:
+                    listings.append({"amount": int(amount), "pricePerUnit": price, "orders": int(orders)})
+            product_data[summary] = listings
+        return product_data
+
+    def __read_chunk(self, chunk: int, product: int, field_positions: list, rows: range) -> list:
+        """
+        Returns:
+            columns (list[array]): One array per requested field, NaN if the product was not yet recorded
+        """
+        product_count = self.chunks[2 * chunk + 1]
+        if product >= product_count:
+            return [array("d", [MISSING] * len(rows)) for _ in field_positions]
+
+        sealed_path = self.__chunk_path(chunk, "z")
+        if os.path.exists(sealed_path):
+            with open(sealed_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                _, row_count, _ = CHUNK_HEADER.unpack_from(mapped, 0)
+                offset, length = struct.unpack_from("<QQ", mapped, CHUNK_HEADER.size + 16 * product)
+                block = array("d")
+                block.frombytes(zlib.decompress(mapped[offset:offset + length]))
+            return [block[position * row_count + rows.start:position * row_count + rows.stop] for position in field_positions]
+
+        stride = product_count * len(FIELDS)
+        with open(self.__chunk_path(chunk, "log"), "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            values = memoryview(mapped).cast("d")
+            columns = []
+            for position in field_positions:
+                offset = product * len(FIELDS) + position
+                columns.append(array("d", values[offset + rows.start * stride:offset + rows.stop * stride:stride]))
+            values.release()
+        return columns
@@ -0,0 +1,252 @@
+"""
+Local stand-in for the Hypixel bazaar API, for benchmarking and soak testing offline.
+
+Serves synthetic catalogues (or a recorded payload) with a controllable number of products,
+book depth, lastUpdated cadence, latency and error rate.
+
+Run: python mock_server.py --products 15000 --depth 30 --error-rate 0.05
+Then: python bazaar.py --url http://127.0.0.1:8000/skyblock/bazaar
+
+Write a fixture instead of serving: python mock_server.py --products 1500 --write-fixture bazaar_fixture.json
+"""
+
+import gzip
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ERROR_KINDS = ("status", "unsuccessful", "truncated")
+QUICK_STATUS_SHARE = 0.02#Quick status prices average the best 2% of each summary's volume, as upstream computes them
+TOP_LISTINGS = 3#Listings at the top of the book are small undercuts, deeper ones are bulk
+PRICE_DRIFT = 0.02#Standard deviation of the log change in a product's mid price on every update
+
+def generate_summary(rng: random.Random, best_price: float, direction: int, depth: int) -> list:
+    """
+    Arguments:
+        best_price (float): Price of the first listing
+        direction (int): 1 for prices rising down the book, -1 for falling
+        depth (int): Number of listings
+
+    Returns:
+        summary (list): Listings in the API's format
+    """
+    summary = []
+    price = best_price
+    for index in range(depth):
+        amount = rng.randint(1, 2240) if index < TOP_LISTINGS else rng.randint(1, 71680)
+        summary.append({"amount": amount, "pricePerUnit": round(price, 1), "orders": rng.randint(1, 40)})
+        price = max(0.1, price + direction * max(0.1, price * rng.choice((0.0005, 0.001, 0.005, 0.02))))
+    return summary
+
+def calculate_quick_price(summary: list) -> float:
+    """
+    Returns:
+        price (float): Volume-weighted average price of the best QUICK_STATUS_SHARE of the summary's volume, 0 if empty
+    """
+    remaining = max(1, sum(listing["amount"] for listing in summary) * QUICK_STATUS_SHARE)
+    weighted_total = amount_total = 0
+    for listing in summary:
+        amount = min(listing["amount"], remaining)
+        weighted_total += amount * listing["pricePerUnit"]
+        amount_total += amount
+        remaining -= amount
+        if remaining <= 0:
+            break
+    return round(weighted_total / amount_total, 1) if amount_total else 0.0
+
+def generate_product(rng: random.Random, product_id: str, depth: int, mid_price: float = None) -> dict:
+    """
+    Follows the real API: sell_summary holds buy orders (best price first, falling),
+    buy_summary holds sell offers (best price first, rising), and the quick status prices
+    average the top of each summary (see calculate_quick_price), so a share of products is profitable to flip.
+
+    Arguments:
+        mid_price (float): Price between the two sides of the book, random if not given
+
+    Returns:
+        product_data (dict): One product in the API's format
+    """
+    mid_price = mid_price or 10 ** rng.uniform(0, 7)
+    spread = rng.uniform(0.001, 0.15)
+    sell_summary = generate_summary(rng, mid_price * (1 - spread / 2), -1, rng.randint(0, depth))
+    buy_summary = generate_summary(rng, mid_price * (1 + spread / 2), 1, rng.randint(0, depth))
+    return {
+        "product_id": product_id,
+        "sell_summary": sell_summary,
+        "buy_summary": buy_summary,
+        "quick_status": {
+            "productId": product_id,
+            "sellPrice": calculate_quick_price(sell_summary),
+            "sellVolume": sum(listing["amount"] for listing in sell_summary),
+            "sellMovingWeek": int(10 ** rng.uniform(0, 8)),
+            "sellOrders": sum(listing["orders"] for listing in sell_summary),
+            "buyPrice": calculate_quick_price(buy_summary),
+            "buyVolume": sum(listing["amount"] for listing in buy_summary),
+            "buyMovingWeek": int(10 ** rng.uniform(0, 8)),
+            "buyOrders": sum(listing["orders"] for listing in buy_summary)
+            }
+        }
+
+def generate_catalogue(product_count: int, depth: int, seed: int = 0) -> dict:
+    """
+    Arguments:
+        product_count (int): Number of products, the real bazaar has roughly 1,500
+        depth (int): Max listings per summary, the real API returns up to 30
+
+    Returns:
+        products (dict): Every key is a product_id, keys map to the product's data
+    """
+    rng = random.Random(seed)
+    return {f"SYNTHETIC_{index:06d}": generate_product(rng, f"SYNTHETIC_{index:06d}", depth) for index in range(product_count)}
+
+def build_payload(products: dict, last_updated: int) -> dict:
+    return {"success": True, "lastUpdated": last_updated, "products": products}
+
+class MockBazaar:
+    """
+    Holds the catalogue served by the mock server and moves it forward once per cadence period on a fixed wall clock grid
+
+    Attributes:
+        products (dict): The catalogue currently served
+        depth (int): Max listings per summary of regenerated products
+        cadence (float): Seconds between upstream updates
+        change_fraction (float): Share of products regenerated on every update
+        last_updated (int): Milliseconds since epoch of the current catalogue
+        body (bytes): Encoded payload of the current catalogue
+        gzipped_body (bytes): Gzip compressed body
+    """
+    def __init__(self, products: dict, depth: int, cadence: float, change_fraction: float, seed: int = 0):
+        self.products = products
+        self.depth = depth
+        self.cadence = cadence
+        self.change_fraction = change_fraction
+        self.last_updated = 0
+        self.body = b""
+        self.gzipped_body = b""
+
+        self.__rng = random.Random(seed)
+        self.__lock = threading.Lock()
+
+    def current_body(self, gzipped: bool) -> tuple:
+        """
+        Returns:
+            body (bytes): The payload, re-encoded if a cadence boundary has passed since the last update
+            last_updated (int): Milliseconds since epoch of the payload
+        """
+        with self.__lock:
+            period = self.cadence * 1000
+            published = int(time.time() * 1000 // period * period)#Publishes sit on a fixed wall clock grid, not on the client's polls
+            if published > self.last_updated:
+                if self.last_updated:
+                    for _ in range(round((published - self.last_updated) / period)):#One update per elapsed period, polled or not
+                        self.__advance()
+                self.last_updated = published
+                self.body = json.dumps(build_payload(self.products, published)).encode()
+                self.gzipped_body = gzip.compress(self.body, compresslevel=5)
+            return (self.gzipped_body if gzipped else self.body), self.last_updated
+
+    def __advance(self) -> None:
+        product_ids = list(self.products)
+        changed = self.__rng.sample(product_ids, int(len(product_ids) * self.change_fraction))
+        for product_id in changed:#Prices drift from where they were, the books and quick status follow
+            product_data = self.products[product_id]
+            mid_price = None
+            if product_data["sell_summary"] and product_data["buy_summary"]:
+                mid_price = (product_data["sell_summary"][0]["pricePerUnit"] + product_data["buy_summary"][0]["pricePerUnit"]) / 2
+                mid_price *= math.exp(self.__rng.gauss(0, PRICE_DRIFT))
+            self.products[product_id] = generate_product(self.__rng, product_id, self.depth, mid_price)
+
+def make_handler(bazaar: MockBazaar, latency: float, error_rate: float, path: str):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"#Keep-alive, like the real API
+
+        def do_GET(self):
+            if self.path.split("?")[0] != path:
+                self.send_error(404)
+                return
+            if latency:
+                time.sleep(latency * random.uniform(0.5, 1.5))
+
+            gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+            body, _ = bazaar.current_body(gzipped)
+            if random.random() < error_rate:
+                error = random.choice(ERROR_KINDS)
+                if error == "status":
+                    self.send_error(503)
+                    return
+                elif error == "unsuccessful":
+                    body = json.dumps({"success": False, "cause": "Mock error"}).encode()
+                    gzipped = False
+                else:
+                    body = (gzip.decompress(body) if gzipped else body)[:len(body) // 2]
+                    gzipped = False
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+    return Handler
+
+def serve(bazaar: MockBazaar, host: str, port: int, latency: float = 0.0, error_rate: float = 0.0, path: str = "/skyblock/bazaar") -> ThreadingHTTPServer:
+    """
+    Start the mock server on a background thread
+
+    Returns:
+        server (ThreadingHTTPServer): Call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(bazaar, latency, error_rate, path))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MockBazaar", daemon=True).start()
+    logger.info(f"Mock bazaar serving {len(bazaar.products)} products on http://{host}:{server.server_address[1]}{path}")
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic or recorded bazaar payloads locally")
+    parser.add_argument("--products", type=int, default=1500, help="Number of synthetic products")
+    parser.add_argument("--depth", type=int, default=30, help="Max listings per summary")
+    parser.add_argument("--fixture", help="Serve the products of a recorded payload instead of synthetic ones")
+    parser.add_argument("--write-fixture", metavar="PATH", help="Write a synthetic payload to PATH and exit")
+    parser.add_argument("--cadence", type=float, default=15.0, help="Seconds between lastUpdated changes")
+    parser.add_argument("--change-fraction", type=float, default=0.3, help="Share of products changed on every update")
+    parser.add_argument("--latency", type=float, default=0.0, help="Average seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of responses which fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.fixture:
+        with open(args.fixture) as file:
+            products = json.load(file)["products"]
+    else:
+        products = generate_catalogue(args.products, args.depth, args.seed)
+
+    if args.write_fixture:
+        with open(args.write_fixture, "w") as file:
+            json.dump(build_payload(products, int(time.time() * 1000)), file)
+        logger.info(f"Wrote {len(products)} products to {args.write_fixture}")
+        return
+
+    bazaar = MockBazaar(products, args.depth, args.cadence, args.change_fraction, args.seed)
+    server = serve(bazaar, args.host, args.port, args.latency, args.error_rate)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
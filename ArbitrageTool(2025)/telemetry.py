@@ -0,0 +1,164 @@
+"""
+Pipeline metrics for the arbitrage tool, rendered in the Prometheus text format.
+
+Phases (fetch, parse, refine, score, select, auctions) are timed into histograms, everything
+else is a counter or a gauge. Metrics are read either from a local HTTP endpoint
+(see Metrics.serve) or from a file rewritten after every scan (see Metrics.write).
+
+Every metric lives in the module's metrics registry, e.g.
+    with metrics.time_phase("parse"): ...
+    metrics.increment("api_errors_total", reason="timeout")
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "bazaar_"
+PHASE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)#Seconds
+DESCRIPTIONS = {
+    "phase_seconds": ("histogram", "Seconds spent in each pipeline phase"),
+    "snapshot_age_seconds": ("gauge", "Seconds between upstream lastUpdated and the flips being ranked"),
+    "products_refined_total": ("counter", "Products whose order book changed and was refined"),
+    "products_skipped_total": ("counter", "Products skipped on refresh as their fingerprint was unchanged"),
+    "products_pruned_total": ("counter", "Changed products left unscored as their profit bound cannot reach the top flips"),
+    "api_errors_total": ("counter", "Failed fetches of the API by reason"),
+    "validation_failures_total": ("counter", "API responses rejected by validation by reason"),
+}
+
+class Histogram:
+    """
+    Cumulative bucket counts, as Prometheus expects
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets, +Inf is implicit
+        counts (list): Observations per bucket, the last being +Inf
+        total (float): Sum of every observation
+    """
+    __slots__ = ("buckets", "counts", "total")
+
+    def __init__(self, buckets: tuple = PHASE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+class Metrics:
+    """
+    Thread-safe registry of every metric, keyed by metric name and label pairs
+
+    Attributes:
+        counters (dict): Every key is (name, labels), keys map to a count
+        gauges (dict): Every key is (name, labels), keys map to the last value set
+        histograms (dict): Every key is (name, labels), keys map to a Histogram
+    """
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+        self.__lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self.__lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def time_phase(self, phase: str):
+        """Time the body of the with block into phase_seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("phase_seconds", time.perf_counter() - start, phase=phase)
+
+    def render(self) -> str:
+        """
+        Returns:
+            text (str): Every metric in the Prometheus text exposition format
+        """
+        with self.__lock:
+            families = {}
+            for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+                families.setdefault(name, []).append(f"{PREFIX}{name}{self.format_labels(labels)} {value}")
+            for (name, labels), histogram in self.histograms.items():
+                lines = families.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{name}_bucket{self.format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{self.format_labels(labels)} {histogram.total}")
+                lines.append(f"{PREFIX}{name}_count{self.format_labels(labels)} {cumulative}")
+
+        text = []
+        for name in sorted(families):
+            kind, description = DESCRIPTIONS.get(name, ("untyped", name))
+            text.append(f"# HELP {PREFIX}{name} {description}")
+            text.append(f"# TYPE {PREFIX}{name} {kind}")
+            text.extend(families[name])
+        return "\n".join(text) + "\n"
+
+    @staticmethod
+    def format_labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+    def write(self, path: str) -> None:
+        """Replace the metrics file at path, for node_exporter's textfile collector or plain reading"""
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write(self.render())
+        os.replace(temporary_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve the metrics on http://host:port/metrics from a background thread
+
+        Returns:
+            server (ThreadingHTTPServer): Call shutdown() to stop it
+        """
+        registry = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="Metrics", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+metrics = Metrics()
@@ -1,12 +1,69 @@
 import discord
 from discord import app_commands, Colour
 from discord.ext import commands, tasks
-from bs4 import BeautifulSoup, Comment
-import requests
+import lxml.html
+import aiohttp
 import datetime
 import asyncio
+import re
+import json
+import sqlite3
+import hashlib
+import functools
+import itertools
+import contextvars
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
+INTERACTIVE = 0#Slash commands, always requested first
+BACKGROUND = 1#auto_update prefetching
+
+@dataclass
+class RequestPriority:
+    """
+    Every coalesced task has its own, following its caller's unless promoted
+    promoting a task therefore moves up the requests it waits on, but not those of its siblings
+    """
+    base: int = INTERACTIVE
+    parent: "RequestPriority" = None
+
+    @property
+    def level(self) -> int:
+        if self.parent is None:
+            return self.base
+        return min(self.base, self.parent.level)
+
+    def promote(self, level: int):
+        self.base = min(self.base, level)
+
+request_priority = contextvars.ContextVar("request_priority", default=None)#None = INTERACTIVE, auto_update sets BACKGROUND
+
+def single_flight(method):
+    """
+    Concurrent calls of the decorated coroutine method on the same object with the same arguments
+    share one in-flight task and its result, e.g. a burst of identical commands costs one scrape
+    a command joining a background task promotes it, so the user does not wait behind the prefetch
+    The object needs an in_flight dictionary
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args):
+        key = (method.__name__, tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args))
+        caller_priority = request_priority.get() or RequestPriority()
+        if key in self.in_flight:
+            task, priority = self.in_flight[key]
+            priority.promote(caller_priority.level)
+        else:
+            priority = RequestPriority(BACKGROUND, caller_priority)
+            async def run():
+                request_priority.set(priority)#Tasks copy the context, so this only applies to calls made by this task
+                return await method(self, *args)
+            task = asyncio.ensure_future(run())
+            self.in_flight[key] = (task, priority)
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(task)#A caller giving up must not cancel the shared task for the others
+    return wrapper
+
 class Team:
     def __init__(self, short_name = "NYY"):
         self.timestamp = datetime.datetime.min
@@ -20,8 +77,13 @@ class Team:
         self.formatted_recent_game = ""
         self.formatted_pitching_scores = ""
         self.formatted_batting_scores = ""
+        self.fingerprints = {"results": None, "batting": None, "pitching": None}#Fingerprint of the records each embed was built from
+        self.box_scores_link = None#Game the box scores were fetched for
+        self.box_scores_timestamp = datetime.datetime.min
+        self.background_refreshes = set()#Keeps refresh tasks alive until they finish
 
         self.scraper = uniscraper
+        self.in_flight = {}#key = (method, arguments), value = (task shared by concurrent callers, its RequestPriority), see single_flight
 
     def check_data_is_stale(self) -> bool:
         if (datetime.datetime.now() - self.timestamp).total_seconds() > self.COOLDOWN:#If past TTL
@@ -29,6 +91,7 @@ class Team:
         else:
             return False
 
+    @single_flight
     async def fetch_latest_game(self):
         url = f"https://www.baseball-reference.com/teams/{self.short_name}/2025-schedule-scores.shtml"
         games = await self.scraper.fetch_records(url, "team_schedule")
@@ -39,16 +102,32 @@ class Team:
         for game in games[::-1]:#iterate backwards until we find the first completed game
             if game["W/L"] in {"W", "L", "W-wo", "L-wo"}:
                 self.recent_game_raw_data = game
+                break
+        self.timestamp = self.scraper.fetch_page_timestamp(url)
 
+    @single_flight
     async def fetch_latest_box_scores(self):
         if not self.recent_game_raw_data:
             await self.fetch_latest_game()
 
-        url = f"https://www.baseball-reference.com" + await self.fetch_most_recent_box_plot_url()
+        link = await self.fetch_most_recent_box_plot_url()
+        url = f"https://www.baseball-reference.com{link}"
         ids = self.fetch_box_scores_tableid()
 
-        self.recent_game_raw_data_batting_scores = await self.scraper.fetch_records(url, ids.batting_id)
-        self.recent_game_raw_data_pitching_scores = await self.scraper.fetch_records(url, ids.pitching_id)
+        table_ids = [ids.batting_id, ids.pitching_id]
+        opponent = self.recent_game_raw_data["Opp"]
+        if opponent in TEAM_NAMES:#Parsed from the same download, ready for when the opponent is requested
+            opponent_ids = self.fetch_box_scores_tableid(opponent)
+            table_ids += [opponent_ids.batting_id, opponent_ids.pitching_id]
+
+        box_scores = await self.scraper.fetch_tables(url, table_ids)
+        if box_scores is None:
+            return
+
+        self.recent_game_raw_data_batting_scores = box_scores.get(ids.batting_id)
+        self.recent_game_raw_data_pitching_scores = box_scores.get(ids.pitching_id)
+        self.box_scores_link = link
+        self.box_scores_timestamp = self.scraper.fetch_page_timestamp(url)
 
     async def fetch_most_recent_box_plot_url(self):
         if not self.recent_game_raw_data:
@@ -61,24 +140,72 @@ class Team:
         batting_id: str
         pitching_id: str
 
-    def fetch_box_scores_tableid(self) -> BoxIDs:
+    def fetch_box_scores_tableid(self, short_name: str = None) -> BoxIDs:
         """
         Each team's box score has a unique id e.g. NYY = NewYorkYankeesbatting
         Translate abbreviation to full team name, remove spaces add batting/pitching 
+        short_name defaults to this team's
         """
-        team_id = TEAM_NAMES[self.short_name].replace(" ", "")
+        team_id = TEAM_NAMES[short_name or self.short_name].replace(" ", "")
         batting_team_id = team_id + "batting"
         pitching_team_id = team_id + "pitching"
         ids = self.BoxIDs(batting_team_id, pitching_team_id)
         return ids
 
+    async def fetch_embed(self, embed_type: str) -> discord.Embed:
+        """
+        Answer from the cached embed immediately, even if slightly stale, and refresh it in the background
+        only a team without an embed yet waits for the scrape
+        embed_type == "results", "batting" or "pitching"
+        """
+        if not self.fetch_formatted_embed(embed_type):
+            await self.refresh_embed(embed_type)
+        elif self.check_data_is_stale():
+            task = asyncio.ensure_future(self.refresh_embed_in_background(embed_type))
+            self.background_refreshes.add(task)
+            task.add_done_callback(self.background_refreshes.discard)
+            task.add_done_callback(report_background_refresh)
+
+        embed = self.fetch_formatted_embed(embed_type)
+        if embed:
+            timestamp = self.timestamp if embed_type == "results" else self.box_scores_timestamp
+            embed.timestamp = timestamp.astimezone()
+            embed.set_footer(text=f"baseball-reference.com, updated {format_age(timestamp)}")
+        return embed
+
+    def fetch_formatted_embed(self, embed_type: str) -> discord.Embed:
+        if embed_type == "results":
+            return self.formatted_recent_game
+        elif embed_type == "batting":
+            return self.formatted_batting_scores
+        elif embed_type == "pitching":
+            return self.formatted_pitching_scores
+
+    async def refresh_embed(self, embed_type: str):
+        if embed_type == "results":
+            await self.create_results_embed()
+        else:
+            await self.create_box_score_embed(embed_type)
+
+    async def refresh_embed_in_background(self, embed_type: str):
+        request_priority.set(RequestPriority(BACKGROUND))#Nobody is waiting on it
+        await self.refresh_embed(embed_type)
+
+    async def refresh_embeds(self):
+        for embed_type in self.fingerprints:
+            await self.refresh_embed(embed_type)
+
+    @single_flight
     async def create_results_embed(self):
-        if not self.recent_game_raw_data:
-            await self.fetch_latest_game()
-        
-        if self.check_data_is_stale():
+        """
+        Rebuilt only when the latest game's record changes
+        """
+        if not self.recent_game_raw_data or self.check_data_is_stale():
             await self.fetch_latest_game()
 
+        fingerprint = fingerprint_records(self.recent_game_raw_data)
+        if fingerprint == self.fingerprints["results"]:
+            return
 
         game_details = self.recent_game_raw_data
         relevant_stats = RESULT_STATS
@@ -109,18 +236,30 @@ class Team:
 
 
         self.formatted_recent_game = embed
+        self.fingerprints["results"] = fingerprint
 
+    @single_flight
     async def create_box_score_embed(self, box_score_type):
         """
         Manipulate the dictionary and create a string which 
-        outputs cleanly on an embed
+        outputs cleanly on an embed, rebuilt only when the game's box scores change
         box_score_type == "batting" or "pitching" 
         """
-        if not self.recent_game_raw_data:
+        if not self.recent_game_raw_data or self.check_data_is_stale():
             await self.fetch_latest_game()
         
-        if not self.recent_game_raw_data_batting_scores or not self.recent_game_raw_data_pitching_scores:
+        if (not self.recent_game_raw_data_batting_scores or not self.recent_game_raw_data_pitching_scores
+                or self.box_scores_link != self.recent_game_raw_data["link"]):#A newer game was played
             await self.fetch_latest_box_scores()
+        if self.box_scores_link != self.recent_game_raw_data["link"]:#Box scores of the newer game could not be fetched, keep the stale embed
+            return
+
+        if box_score_type == "batting":
+            fingerprint = fingerprint_records(self.recent_game_raw_data, self.recent_game_raw_data_batting_scores)
+        else:
+            fingerprint = fingerprint_records(self.recent_game_raw_data, self.recent_game_raw_data_pitching_scores)
+        if fingerprint == self.fingerprints[box_score_type]:
+            return
 
         if box_score_type == "batting":
             box_scores = self.recent_game_raw_data_batting_scores
@@ -184,12 +323,12 @@ class Team:
             colour = colour,
             description = description
         )
-        embed.set_footer(text="baseball-reference.com")
 
         if box_score_type == "batting":
             self.formatted_batting_scores = embed
         elif box_score_type == "pitching":
             self.formatted_pitching_scores = embed
+        self.fingerprints[box_score_type] = fingerprint
                     
     def format_name(self, player_name: str):
         """
@@ -205,15 +344,59 @@ class Team:
 
 class Scraper:
     def __init__(self):
-        self.lock = asyncio.Lock()
-        self.timestamp = datetime.datetime.min
         self.COOLDOWN = 3#min seconds between calls, to comply with robots.txt
+        self.limiter = RateLimiter(self.COOLDOWN)#Only requests wait for it, cache hits and parsing never do
+        self.TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10, sock_read=20)#Seconds, a stuck download must not hang its callers forever
+        self.session = None
+        self.parser_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="parser")#lxml releases the GIL while parsing
+        self.PAGE_TTL = 300#Seconds a downloaded page is reused, shorter than Team.COOLDOWN so refreshes see new games
+        self.PAGE_CACHE_SIZE = 32#Max pages kept, least recently used are dropped first
+        self.page_cache = OrderedDict()#key = url, value = CachedPage
+        self.STORE_PATH = "yankeebot_cache.sqlite3"#Pages and records survive restarts here
+        self.STORE_MAX_AGE = 604800#Seconds(7 days) before a stored page is deleted, stale pages are still revalidated with a conditional request
+        self.store = PageStore(self.STORE_PATH, self.STORE_MAX_AGE)
+        self.store_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")#The only thread using the database
+        self.in_flight = {}#key = (method, arguments), value = (task shared by concurrent callers, its RequestPriority), see single_flight
 
-    def check_cooldown_elapsed(self) -> bool:
-        if (datetime.datetime.now() - self.timestamp).total_seconds() > self.COOLDOWN:
-            return True
-        else:
-            return False
+    @dataclass
+    class CachedPage:
+        timestamp: datetime.datetime
+        html: str
+        tables: dict#key = table id, value = records already parsed from the page
+        etag: str = ""#Validators sent back on revalidation, a 304 reuses the page and its records
+        last_modified: str = ""
+
+    async def fetch_session(self) -> aiohttp.ClientSession:
+        """
+        One pooled session reused by every request, so connections are kept alive between scrapes
+        Created lazily as aiohttp sessions must be created inside the running event loop
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.TIMEOUT,
+                headers={"Accept-Encoding": "gzip, deflate"})
+        return self.session
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.parser_pool.shutdown(wait=False)
+        await self.run_store(self.store.close)
+        self.store_pool.shutdown(wait=False)
+
+    async def run_store(self, function, *args):
+        """
+        Run a PageStore method on store_pool so disk access never blocks the event loop
+        the store is only a cache, errors are printed and None is returned
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.store_pool, function, *args)
+        except (sqlite3.Error, ValueError) as e:#ValueError from a corrupt records row
+            print(f"Error accessing page store! Error: {e}")
+            return None
 
     async def fetch_records(self, url: str, table_id: str) -> list[dict]:
         """
@@ -221,57 +404,321 @@ class Scraper:
         returns a list of dictionaries, key = header description, value = record value
         also returns the hyperlink for boxscore as the last element
         """
-        await self.lock.acquire()
-        if not self.check_cooldown_elapsed():
-            await asyncio.sleep(self.COOLDOWN)#To enable safe access concurrently
-        try:        
-            response = requests.get(url)
-            response.raise_for_status()
-            self.timestamp = datetime.datetime.now()
-            soup = BeautifulSoup(response.text, "html.parser")
-            table = soup.find("table", id = table_id)
-            
-            if not table:#In particular for box scores, which are commented out
-                comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-                for comment in comments:
-                    comment_soup = BeautifulSoup(comment, "html.parser")
-                    table = comment_soup.find("table", id=table_id)
-                    if table:
-                        break
-
-            headers = table.find("thead").find_all("th")
-            headers = [header.text for header in headers]
-
-            body = table.find("tbody")
-            records = body.find_all("tr")
-
-            entries = []
-            for record in records:
-                link = ""
-                record_data = record.find_all(["th", "td"])#Gm1 is stored as a header 
-                values = [value.text for value in record_data]
-                if table_id == "team_schedule":
-                    boxscore = record.find("a", string = "boxscore")
-                    if boxscore:
-                        link = boxscore.get("href")
-
-                entry = {header: value for header, value in zip(headers, values)}
-                entry["link"] = link
-                entries.append(entry)
-            return entries
-        
+        tables = await self.fetch_tables(url, [table_id])
+        if tables is None:
+            return None
+        return tables.get(table_id)
+
+    @single_flight
+    async def fetch_tables(self, url: str, table_ids: list[str]) -> dict:
+        """
+        Extract several tables from a single download of the page, e.g. both teams' batting and pitching box scores
+        returns a dictionary, key = table id, value = records (see fetch_records), None if the page could not be fetched
+        tables which could not be found are left out
+        """
+        page = await self.fetch_page(url)
+        if page is None:
+            return None
+
+        unparsed = [table_id for table_id in table_ids if table_id not in page.tables]
+        if unparsed:
+            try:
+                loop = asyncio.get_running_loop()
+                parsed = await loop.run_in_executor(self.parser_pool, parse_tables, page.html, unparsed)#Keep parsing off the event loop
+            except Exception as e:
+                print(f"Error parsing '{url}', {unparsed}! Error: {e}")
+                return None
+            page.tables.update(parsed)
+            await self.run_store(self.store.save_records, url, parsed)
+
+        for table_id in table_ids:
+            if table_id not in page.tables:
+                print(f"Error parsing '{url}', '{table_id}'! Perhaps table was changed?")
+        return {table_id: page.tables[table_id] for table_id in table_ids if table_id in page.tables}
+
+    def fetch_page_timestamp(self, url: str) -> datetime.datetime:
+        """
+        returns when the page was last downloaded or revalidated, now if it is no longer cached
+        """
+        page = self.page_cache.get(url)
+        return page.timestamp if page else datetime.datetime.now()
+
+    def check_page_is_fresh(self, page: "Scraper.CachedPage") -> bool:
+        return (datetime.datetime.now() - page.timestamp).total_seconds() <= self.PAGE_TTL
+
+    def fetch_cached_page(self, url: str) -> "Scraper.CachedPage":
+        page = self.page_cache.get(url)
+        if page is None:
+            return None
+        if not self.check_page_is_fresh(page):
+            del self.page_cache[url]
+            return None
+        self.page_cache.move_to_end(url)
+        return page
+
+    def cache_page(self, url: str, page: "Scraper.CachedPage"):
+        self.page_cache[url] = page
+        self.page_cache.move_to_end(url)
+        if len(self.page_cache) > self.PAGE_CACHE_SIZE:
+            self.page_cache.popitem(last=False)
+
+    @single_flight
+    async def fetch_page(self, url: str) -> "Scraper.CachedPage":
+        """
+        Download a page, at most one download every COOLDOWN seconds, commands are queued ahead of auto_update
+        pages downloaded within PAGE_TTL seconds are reused instead, from memory or the page store
+        older stored pages are revalidated, a 304 reuses the stored page and its parsed records
+        returns the cached page, the stale stored page if revalidating it failed, None if there is neither
+        """
+        page = self.fetch_cached_page(url)
+        if page:
+            return page
+
+        stored = await self.run_store(self.store.load_page, url)
+        if stored and self.check_page_is_fresh(stored):#Warm after a restart
+            self.cache_page(url, stored)
+            return stored
+        stored_timestamp = stored.timestamp if stored else None
+
+        try:
+            headers = {}
+            if stored and stored.etag:
+                headers["If-None-Match"] = stored.etag
+            if stored and stored.last_modified:
+                headers["If-Modified-Since"] = stored.last_modified
+
+            await self.limiter.acquire(request_priority.get() or RequestPriority())
+            session = await self.fetch_session()
+            async with session.get(url, headers=headers) as response:#Awaiting the download lets other commands and heartbeats run
+                if response.status == 304 and stored:#Unchanged, nothing to download or parse
+                    page = stored
+                else:
+                    response.raise_for_status()
+                    html = await response.text()
+                    page = self.CachedPage(None, html, {}, response.headers.get("ETag", ""), response.headers.get("Last-Modified", ""))
+            page.timestamp = datetime.datetime.now()
+
+            if page is stored:
+                await self.run_store(self.store.touch_page, url, page.timestamp)
+            else:
+                await self.run_store(self.store.save_page, url, page)
+            self.cache_page(url, page)
+            return page
+
         except Exception as e:
-            print(f"Error parsing '{url}', '{table_id}'! Perhaps table was changed? Error: {e}")
+            print(f"Error fetching '{url}'! Error: {e}")
+            if stored is None:
+                return None
+            stored.timestamp = stored_timestamp#Stale, but better than no answer, revalidated again on the next fetch
+            self.cache_page(url, stored)
+            return stored
+
+class PageStore:
+    """
+    SQLite copy of downloaded pages and the records parsed from them, keyed by url and table id
+    records share their page's TTL and are deleted whenever the page's body changes
+    """
+    def __init__(self, path: str, max_age: float):
+        self.connection = sqlite3.connect(path, check_same_thread=False)#Only used from Scraper.store_pool's single thread
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, fetched REAL, etag TEXT, last_modified TEXT, html TEXT);
+            CREATE TABLE IF NOT EXISTS records (url TEXT, table_id TEXT, records TEXT, PRIMARY KEY (url, table_id));
+        """)
+        with self.connection:#Drop pages no longer worth revalidating
+            cutoff = datetime.datetime.now().timestamp() - max_age
+            self.connection.execute("DELETE FROM records WHERE url IN (SELECT url FROM pages WHERE fetched < ?)", (cutoff,))
+            self.connection.execute("DELETE FROM pages WHERE fetched < ?", (cutoff,))
+
+    def load_page(self, url: str) -> Scraper.CachedPage:
+        """
+        returns the stored page with every table already parsed from it, None if the page was never stored
+        """
+        row = self.connection.execute("SELECT fetched, etag, last_modified, html FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
             return None
+        fetched, etag, last_modified, html = row
+        tables = {table_id: json.loads(records) for table_id, records in
+                  self.connection.execute("SELECT table_id, records FROM records WHERE url = ?", (url,))}
+        return Scraper.CachedPage(datetime.datetime.fromtimestamp(fetched), html, tables, etag, last_modified)
+
+    def save_page(self, url: str, page: Scraper.CachedPage):
+        with self.connection:
+            self.connection.execute("DELETE FROM records WHERE url = ?", (url,))#Parsed from the old body
+            self.connection.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                                    (url, page.timestamp.timestamp(), page.etag, page.last_modified, page.html))
+
+    def touch_page(self, url: str, timestamp: datetime.datetime):
+        """Restart the TTL of a page revalidated with a 304"""
+        with self.connection:
+            self.connection.execute("UPDATE pages SET fetched = ? WHERE url = ?", (timestamp.timestamp(), url))
+
+    def save_records(self, url: str, tables: dict):
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?)",
+                                        [(url, table_id, json.dumps(records)) for table_id, records in tables.items()])
+
+    def close(self):
+        self.connection.close()
+
+class RateLimiter:
+    """
+    Token bucket holding the robots.txt budget of one request every interval seconds
+    waiting requests are granted most urgent RequestPriority first, then in order of arrival
+    """
+    def __init__(self, interval: float, burst: int = 1):
+        self.interval = interval
+        self.burst = burst#Max requests sent back to back after a quiet period
+        self.tokens = burst
+        self.timestamp = None#Loop time of the last refill
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.dispatcher = None
+        self.wait_times = {INTERACTIVE: deque(maxlen=100), BACKGROUND: deque(maxlen=100)}#Seconds recent requests spent queued
 
-        finally:
-            self.lock.release()
+    @dataclass
+    class Waiter:
+        priority: RequestPriority
+        sequence: int
+        future: asyncio.Future
+
+    def refill(self):
+        now = asyncio.get_running_loop().time()
+        if self.timestamp is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.timestamp) / self.interval)
+        self.timestamp = now
+
+    async def acquire(self, priority: RequestPriority) -> float:
+        """
+        Wait for a token, only the remaining time until the next one is waited
+        returns the seconds spent queued
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.refill()
+        if not self.waiters and self.tokens >= 1:
+            self.tokens -= 1
+            self.wait_times[priority.level].append(0.0)
+            return 0.0
+
+        waiter = self.Waiter(priority, next(self.sequence), loop.create_future())
+        self.waiters.append(waiter)
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.ensure_future(self.dispatch())
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            elif not waiter.future.cancelled():#Granted as the caller gave up, hand the token to the next request
+                self.tokens += 1
+            raise
+
+        wait = loop.time() - start
+        self.wait_times[priority.level].append(wait)
+        return wait
+
+    async def dispatch(self):
+        while self.waiters:
+            self.refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.interval)
+                continue
+            waiter = min(self.waiters, key=lambda waiter: (waiter.priority.level, waiter.sequence))#Levels change on promotion, so no heap
+            self.waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            self.tokens -= 1
+            waiter.future.set_result(None)
+
+    def describe(self) -> str:
+        """
+        returns the queue length and the average wait of recent interactive and background requests
+        """
+        description = f"Queued requests: {len(self.waiters)}\n"
+        for level, name in ((INTERACTIVE, "Commands"), (BACKGROUND, "Auto update")):
+            waits = self.wait_times[level]
+            average = sum(waits) / len(waits) if waits else 0.0
+            description += f"{name}: {average:.1f}s average wait over {len(waits)} requests\n"
+        return description
+
+def report_background_refresh(task: asyncio.Task):
+    """
+    Background refreshes are never awaited, retrieve their exception so it is reported
+    """
+    if not task.cancelled() and task.exception():
+        print(f"Error refreshing embed in the background! Error: {task.exception()!r}")
+
+def fingerprint_records(*records) -> str:
+    """
+    returns a hash of the records, equal only if every value is equal
+    """
+    return hashlib.sha1(json.dumps(records, sort_keys=True).encode()).hexdigest()
+
+def format_age(timestamp: datetime.datetime) -> str:
+    seconds = (datetime.datetime.now() - timestamp).total_seconds()
+    if seconds < 60:
+        return "just now"
+    elif seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    return f"{int(seconds // 3600)} h ago"
+
+TABLE_PATTERN = re.compile(r'<table\b[^>]*?\bid="([^"]+)"')
+
+def index_tables(html: str) -> dict:
+    """
+    Locate every table in one pass over the raw page, including tables commented out
+    by baseball-reference (e.g. box scores), without parsing anything
+    returns a dictionary, key = table id, value = (start, end) of the table's markup
+    """
+    index = {}
+    for match in TABLE_PATTERN.finditer(html):
+        end = html.find("</table>", match.end())
+        if end != -1 and match.group(1) not in index:
+            index[match.group(1)] = (match.start(), end + len("</table>"))
+    return index
+
+def parse_tables(html: str, table_ids: list[str]) -> dict:
+    """
+    Parse only the requested tables with lxml, runs on Scraper.parser_pool
+    returns a dictionary, key = table id, value = records of the table (see extract_records), missing tables are left out
+    """
+    index = index_tables(html)
+    tables = {}
+    for table_id in table_ids:
+        if table_id not in index:
+            continue
+        start, end = index[table_id]
+        table = lxml.html.fragment_fromstring(html[start:end])
+        tables[table_id] = extract_records(table, table_id)
+    return tables
+
+def extract_records(table, table_id: str) -> list[dict]:
+    headers = [header.text_content() for header in table.xpath("./thead//th")]
+
+    entries = []
+    for record in table.xpath("./tbody//tr"):
+        link = ""
+        values = [value.text_content() for value in record.xpath(".//th|.//td")]#Gm1 is stored as a header 
+        if table_id == "team_schedule":
+            boxscore = record.xpath(".//a[text()='boxscore']/@href")
+            if boxscore:
+                link = boxscore[0]
+
+        entry = {header: value for header, value in zip(headers, values)}
+        entry["link"] = link
+        entries.append(entry)
+    return entries
+
+class YankeeBot(commands.Bot):
+    async def close(self):
+        await uniscraper.close()#Release pooled connections on shutdown
+        await super().close()
 
 uniscraper = Scraper()
 team_cache = {}
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+bot = YankeeBot(command_prefix='!', intents=intents)
 
 @bot.event
 async def on_ready():
@@ -324,10 +771,7 @@ async def batting(interaction, team: str = "NYY"):
     if team not in team_cache:
         team_cache[team] = Team(team)
 
-    if not team_cache[team].formatted_batting_scores:
-        await team_cache[team].create_box_score_embed("batting")
-
-    embed = team_cache[team].formatted_batting_scores
+    embed = await team_cache[team].fetch_embed("batting")
     await interaction.followup.send(embed=embed)
 
 
@@ -344,10 +788,7 @@ async def pitching(interaction, team: str = "NYY"):
     if team not in team_cache:
         team_cache[team] = Team(team)
 
-    if not team_cache[team].formatted_pitching_scores:
-        await team_cache[team].create_box_score_embed("pitching")
-
-    embed = team_cache[team].formatted_pitching_scores
+    embed = await team_cache[team].fetch_embed("pitching")
     await interaction.followup.send(embed=embed)
 
     
@@ -364,24 +805,32 @@ async def results(interaction, team: str = "NYY"):
     if team not in team_cache:
         team_cache[team] = Team(team)
 
-    if not team_cache[team].formatted_recent_game:
-        await team_cache[team].create_results_embed()
-
-    embed = team_cache[team].formatted_recent_game
+    embed = await team_cache[team].fetch_embed("results")
     await interaction.followup.send(embed=embed)
 
+@bot.tree.command(name="status", description="Show how long requests to baseball-reference.com are queued.")
+async def status(interaction):
+    embed = discord.Embed(
+        title = "Scraper Queue",
+        description = uniscraper.limiter.describe(),
+        colour = Colour.teal()
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @tasks.loop(minutes = 7.5)
 async def auto_update():
     """
     To reduce wait times, automatically cache the information about frequently accessed teams periodically:
     NYY, the team NYY most recently played, NYM, BRS
+    Requests are queued behind every command's
     """
+    request_priority.set(RequestPriority(BACKGROUND))
     for team in ["NYY", "NYM", "BOS"]:
         if team not in team_cache:
             team_cache[team] = Team(team)
         
         if team_cache[team].check_data_is_stale():
-            await team_cache[team].fetch_latest_box_scores()
+            await team_cache[team].refresh_embeds()
 
     recent_opp = team_cache["NYY"].recent_game_raw_data["Opp"]
     
@@ -389,7 +838,7 @@ async def auto_update():
         team_cache[recent_opp] = Team(recent_opp)
         
     if team_cache[recent_opp].check_data_is_stale():
-        await team_cache[recent_opp].fetch_latest_box_scores()    
+        await team_cache[recent_opp].refresh_embeds()
 
 TEAM_NAMES = {
     "ARI": "Arizona Diamondbacks", 